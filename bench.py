@@ -0,0 +1,487 @@
+#
+# Offline micro-benchmarks for Stock hot paths.
+#
+#  Run with:
+#
+#    python bench.py [--json bench.json] [--quick] [recorded fixtures ...]
+#
+#  Fixtures are saved Yahoo finance responses: historical CSV (*.csv) and key statistics
+#  pages (*.html). Without them only synthetic data is used. Every measurement is written
+#  to the JSON file so runs can be compared for regressions.
+#
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import timeit
+
+from datetime import date, datetime, timedelta
+
+from stock.backtest import backtest
+from stock.batch import Panel
+from stock.history import History, np
+from stock.stats import STATS_DIV_CLASS, VALUE_TD_CLASS, extract_statistics
+from stock.stock import Stock
+
+def synthetic_csv(years, start=date(1962, 1, 2), seed=1):
+    """
+    Build a Yahoo finance style CSV of random daily bars (weekdays only).
+
+    :param years: Number of years of history
+    :param start: First date of history
+    :param seed: Random seed so runs are repeatable
+    :returns: CSV string including header and trailing newline
+    """
+    rnd = random.Random(seed)
+    lines = ['Date,Open,High,Low,Close,Adj Close,Volume']
+    price = 20.0
+
+    day = start
+    end = start + timedelta(days=int(365.25 * years))
+    while day < end:
+        if day.weekday() < 5:
+            close = max(0.5, price * (1 + rnd.gauss(0, 0.02)))
+            high = max(price, close) * 1.01
+            low = min(price, close) * 0.99
+            lines.append('%s,%.6f,%.6f,%.6f,%.6f,%.6f,%d'
+                         % (day.isoformat(), price, high, low, close, close * 0.98,
+                            rnd.randint(100000, 10000000)))
+            price = close
+        day += timedelta(days=1)
+
+    return '\n'.join(lines) + '\n'
+
+def synthetic_history(years, start=date(1962, 1, 2), seed=1):
+    """
+    Build random daily bars (weekdays only) straight into columns.
+
+    :param years: Number of years of history
+    :param start: First date of history
+    :param seed: Random seed so runs are repeatable
+    :returns: History instance
+    """
+    rnd = np.random.default_rng(seed)
+
+    dates = np.arange(start.toordinal(), start.toordinal() + int(365.25 * years))
+    dates = dates[(dates + 6) % 7 < 5] # Ordinal 1 is a Monday
+
+    close = 20 * np.cumprod(1 + rnd.normal(0, 0.02, len(dates)))
+    open = np.concatenate(([20.0], close[:-1]))
+    high = np.maximum(open, close) * 1.01
+    low = np.minimum(open, close) * 0.99
+
+    return History(dates, open.round(2), high.round(2), low.round(2), close.round(2),
+                   (close * 0.98).round(2), rnd.integers(100000, 10000000, len(dates)))
+
+def synthetic_stats_page(n_stats=60, filler_kb=400, seed=1):
+    """
+    Build a page laid out like Yahoo finance's key statistics page, padded out with
+    unrelated markup to roughly the size of the real page.
+
+    :param n_stats: Number of statistics
+    :param filler_kb: Size of unrelated markup around the statistics, in KB
+    :param seed: Random seed so runs are repeatable
+    :returns: HTML string
+    """
+    rnd = random.Random(seed)
+    values = ['N/A', '1.23B', '45.67M', '2.10T', '12.34%', '0.87', 'Mar 5, 2017', '3:2',
+              'Dec 28, 2017', '1,234.56', '-0.15']
+
+    filler = []
+    while sum(len(piece) for piece in filler) < filler_kb * 1024:
+        filler.append('<div class="Pos(r) D(ib)"><span data-reactid="%s">Filler &amp; '
+                      'more</span><a href="/quote/X">X</a></div>' % rnd.randint(0, 9999))
+        filler.append('<script>window.App = {"x": "%s"};</script>' % ('y' * rnd.randint(10, 200)))
+
+    rows = []
+    for i in range(n_stats):
+        rows.append('<tr class="Bxz(bb) H(36px)"><td class="Pos(st) Start(0) Bgc($lv2BgColor)">'
+                    '<span>Statistic %s</span><sup aria-label="footnote">%s</sup></td>'
+                    '<td class="%s">%s</td></tr>'
+                    % (i, i % 7, VALUE_TD_CLASS, rnd.choice(values)))
+
+    stats = ('<div class="%s"><div class="Fl(start)"><table class="W(100%%)"><tbody>%s'
+             '</tbody></table></div></div>' % (STATS_DIV_CLASS, ''.join(rows)))
+
+    half = len(filler) // 2
+    return ('<html><body>%s%s%s</body></html>'
+            % (''.join(filler[:half]), stats, ''.join(filler[half:])))
+
+# Every measurement taken, as written to the JSON file
+RESULTS = []
+
+# Benchmark measurements are recorded under - set by section()
+BENCHMARK = None
+
+def section(benchmark, title):
+    """
+    Start a benchmark - following measurements are recorded under its name.
+    """
+    global BENCHMARK
+
+    BENCHMARK = benchmark
+    print('\n' + title)
+
+def record(name, value, unit, **params):
+    """
+    Keep a measurement for the JSON file.
+
+    :param name: Name of the measurement within the benchmark
+    :param value: Measured value
+    :param unit: Unit of value
+    :param params: Parameters of the case measured (years, tickers, ...)
+    """
+    RESULTS.append(dict(params, benchmark=BENCHMARK, name=name, value=value, unit=unit))
+
+def report(name, seconds, number, **params):
+    """
+    Print out and record timing per call.
+    """
+    print('  %-40s %10.2f us/call' % (name, seconds / number * 1e6))
+    record(name, seconds / number * 1e6, 'us/call', **params)
+
+def write_results(path):
+    """
+    Write every measurement out as JSON, along with what it was measured on.
+    """
+    with open(path, 'w') as f:
+        json.dump({'created' : datetime.now().isoformat(timespec='seconds'),
+                   'python' : platform.python_version(),
+                   'numpy' : np.__version__ if np else None,
+                   'platform' : platform.platform(),
+                   'optimized' : not __debug__,
+                   'results' : RESULTS}, f, indent=1)
+
+    print('\nWrote %s results to %s' % (len(RESULTS), path))
+
+def load_fixtures(paths):
+    """
+    Read recorded fixtures.
+
+    :param paths: Paths of saved CSV (*.csv) and statistics pages (anything else)
+    :returns: Tuple of ({name : CSV}, [page HTML])
+    """
+    csvs = {}
+    pages = []
+
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.csv'):
+                csvs[os.path.basename(path)] = f.read()
+            else:
+                pages.append(f.read())
+
+    return csvs, pages
+
+#
+# CSV ingest
+#
+
+# Minimum rows per second for columnar ingest
+CSV_INGEST_TARGET = 500000
+
+def bench_csv_ingest(years=60, number=5):
+    raw_csv = synthetic_csv(years)
+    rows = raw_csv.count('\n') - 1
+    section('csv_ingest', 'CSV ingest (%s years, %s daily bars)' % (years, rows))
+
+    for name, columnar in (('list', False), ('columnar', True)):
+        seconds = timeit.timeit(lambda: Stock.from_csv('BENCH', raw_csv, columnar=columnar),
+                                number=number) / number
+        rate = rows / seconds
+        print('  %-40s %10.0f rows/s' % (name, rate))
+        record(name, rate, 'rows/s', years=years)
+
+    if rate < CSV_INGEST_TARGET:
+        print('***WARNING*** Columnar ingest below target of %s rows/s' % CSV_INGEST_TARGET)
+
+#
+# Statistics page parsing
+#
+def soup_statistics(html):
+    """
+    Previous BeautifulSoup extraction, for comparison.
+    """
+    from bs4 import BeautifulSoup
+
+    parsed_resp = BeautifulSoup(html, 'html.parser')
+    stats_values = parsed_resp.find_all('div', STATS_DIV_CLASS)[0].find_all('td', VALUE_TD_CLASS)
+
+    return [(values.previous_sibling.find('span').get_text(), values.get_text())
+            for values in stats_values]
+
+def bench_stats_parse(pages=(), number=20):
+    recorded = bool(pages)
+    if not pages:
+        pages = [synthetic_stats_page()]
+
+    section('stats_parse', 'Statistics parsing (%s %s pages, %s KB each)'
+            % (len(pages), 'recorded' if recorded else 'synthetic',
+               sum(len(page) for page in pages) // len(pages) // 1024))
+
+    try:
+        for page in pages:
+            assert extract_statistics(page) == soup_statistics(page)
+
+        seconds = timeit.timeit(lambda: [soup_statistics(page) for page in pages],
+                                number=max(1, number // 10))
+        report('BeautifulSoup', seconds, max(1, number // 10) * len(pages))
+    except ImportError:
+        print('  BeautifulSoup not installed, skipping comparison')
+
+    seconds = timeit.timeit(lambda: [extract_statistics(page) for page in pages], number=number)
+    report('streaming', seconds, number * len(pages))
+
+    stock = Stock.from_csv('BENCH', synthetic_csv(1))
+    stats = [val for page in pages for _, val in extract_statistics(page)]
+    seconds = timeit.timeit(lambda: [stock._parse_stat(val) for val in stats], number=number)
+    report('_parse_stat', seconds, number * len(stats))
+
+    # Everything _request_statistics does once the page is downloaded
+    seconds = timeit.timeit(lambda: [stock._parse_statistics(page) for page in pages],
+                            number=number)
+    report('_parse_statistics', seconds, number * len(pages))
+
+#
+# Cross sectional indicators
+#
+def bench_cross_section(sizes=(10, 100, 1000, 5000), years=5, number=3):
+    section('cross_section',
+            'Cross sectional indicators (%s years of daily bars, 1%% missing)' % years)
+
+    history = synthetic_history(years)
+    rnd = random.Random(3)
+
+    for n_tickers in sizes:
+        stocks = []
+        for i in range(n_tickers):
+            # Vary listing dates and drop some bars
+            first = rnd.randint(0, len(history) // 4)
+            keep = np.random.default_rng(i).random(len(history) - first) > 0.01
+            days = history[first:]
+            stocks.append(Stock.from_history('T%s' % i, History(
+                *[getattr(days, name)[keep] for name in ('dates',) + History.COLUMNS])))
+
+        def run():
+            panel = Panel(stocks)
+            panel.rsi()
+            panel.macd()
+            panel.bollinger()
+            panel.zscore()
+
+        seconds = timeit.timeit(run, number=number) / number
+        print('  %-6s tickers %10.1f ms %10.1f us/ticker'
+              % (n_tickers, seconds * 1e3, seconds / n_tickers * 1e6))
+        record('panel', seconds / n_tickers * 1e6, 'us/ticker', tickers=n_tickers,
+               years=years)
+
+#
+# Date lookup - month/day walk (previous implementation) vs binary search
+#
+def month_index(stock):
+    """
+    Build the previous { <year> : { <month> : <first day index> } } index.
+    """
+    index = {}
+    for i, day in enumerate(stock.stock):
+        index.setdefault(day[0].year, {}).setdefault(day[0].month, i)
+    return index
+
+def month_walk_date_index(stock, index, date):
+    """
+    Previous _get_date_index: jump to first day of the month and step forward.
+    """
+    max_index = len(stock.stock) - 1
+    try:
+        curr_index = index[date.year][date.month]
+    except KeyError:
+        return 0 if stock.stock[0][0] > date else max_index
+
+    while True:
+        curr_date = stock.stock[curr_index][0]
+        if curr_date < date:
+            if curr_index < max_index:
+                curr_index += 1
+            else:
+                return curr_index
+        elif curr_date > date:
+            return (curr_index - 1) if curr_index > 0 else curr_index
+        else:
+            return curr_index
+
+def bench_date_index(years=50, number=100000):
+    section('date_index', 'Date lookup (%s years of daily bars)' % years)
+
+    stock = Stock.from_csv('BENCH', synthetic_csv(years))
+    first = stock.stock[0][0]
+    rnd = random.Random(2)
+    dates = [first + timedelta(days=rnd.randint(0, int(365.25 * years))) for _ in range(1000)]
+    index = month_index(stock)
+
+    for d in dates:
+        assert stock._get_date_index(d) == month_walk_date_index(stock, index, d)
+
+    seconds = timeit.timeit(lambda: [month_walk_date_index(stock, index, d) for d in dates],
+                            number=number // 1000)
+    report('month walk', seconds, number)
+
+    seconds = timeit.timeit(lambda: [stock._get_date_index(d) for d in dates],
+                            number=number // 1000)
+    report('binary search', seconds, number)
+
+    stock = Stock.from_csv('BENCH', synthetic_csv(years), columnar=True)
+    seconds = timeit.timeit(lambda: [stock._get_date_index(d) for d in dates],
+                            number=number // 1000)
+    report('binary search (columnar)', seconds, number)
+
+#
+# Backtest - day by day accessor loop vs whole array engine
+#
+def loop_backtest(stock, signals, cash):
+    """
+    Backtest the way callers used to: open() and close() for every day.
+    """
+    dates = [day[0] for day in stock.stock]
+    held = 0.0
+    equity = []
+
+    for i, date in enumerate(dates):
+        target = signals[i - 1] if i else 0.0
+        if target != held:
+            cash -= (target - held) * stock.open(date)
+            held = target
+        equity.append(cash + held * stock.close(date))
+
+    return equity
+
+def bench_backtest(years=20, number=20):
+    section('backtest', 'Backtest (%s years of daily bars, SMA 50 crossover)' % years)
+
+    stock = Stock.from_csv('BENCH', synthetic_csv(years), columnar=True, advanced=True)
+    signals = np.where(stock.history.close > stock.indicators.sma(50), 100.0, 0.0)
+
+    listed = Stock.from_csv('BENCH', synthetic_csv(years))
+    assert np.allclose(loop_backtest(listed, signals, 10000.0),
+                       backtest(stock, signals, 10000.0).equity)
+
+    seconds = timeit.timeit(lambda: loop_backtest(listed, signals, 10000.0), number=1)
+    report('accessor loop', seconds, 1)
+
+    seconds = timeit.timeit(lambda: backtest(stock, signals, 10000.0, 0.001, 0.0005),
+                            number=number)
+    report('vectorized', seconds, number)
+
+#
+# Hot paths - parse, index, lookup and range queries from 1 to 60 years of history
+#
+def time_hot_paths(stock, raw_csv, lookups, ranges, number, **params):
+    """
+    Time each hot path of one stock.
+
+    :param stock: Stock built from raw_csv
+    :param raw_csv: CSV the stock was built from
+    :param lookups: datetimes to look up
+    :param ranges: (start, end) datetimes to query
+    :param number: Number of times to repeat cheap calls
+    """
+    repeat = max(1, number // 100)
+    seconds = timeit.timeit(lambda: stock._parse_stock_csv(raw_csv), number=repeat)
+    report('_parse_stock_csv', seconds, repeat, **params)
+
+    seconds = timeit.timeit(lambda: stock._index_stock_data(stock.stock), number=repeat)
+    report('_index_stock_data', seconds, repeat, **params)
+
+    seconds = timeit.timeit(lambda: [stock._get_date_index(d) for d in lookups],
+                            number=max(1, number // len(lookups)))
+    report('_get_date_index', seconds, max(1, number // len(lookups)) * len(lookups),
+           **params)
+
+    repeat = max(1, number // len(lookups))
+    seconds = timeit.timeit(lambda: stock.close(lookups), number=repeat)
+    report('close batch (per date)', seconds, repeat * len(lookups), **params)
+
+    repeat = max(1, number // 10 // len(ranges))
+    seconds = timeit.timeit(lambda: [stock.day_info(start, end) for start, end in ranges],
+                            number=repeat)
+    report('day_info range', seconds, repeat * len(ranges), **params)
+
+    seconds = timeit.timeit(lambda: [stock.close(start, end) for start, end in ranges],
+                            number=repeat)
+    report('close range', seconds, repeat * len(ranges), **params)
+
+def bench_hot_paths(sizes=(1, 5, 20, 60), csvs=None, number=20000):
+    section('hot_paths', 'Hot paths by history size (one ticker)')
+
+    cases = [('%s years' % years, synthetic_csv(years), {'years' : years}) for years in sizes]
+    cases += [(name, raw_csv, {'fixture' : name}) for name, raw_csv in (csvs or {}).items()]
+
+    rnd = random.Random(4)
+
+    for label, raw_csv, params in cases:
+        for storage, columnar in (('list', False), ('columnar', True)):
+            stock = Stock.from_csv('BENCH', raw_csv, columnar=columnar)
+            if not len(stock.stock):
+                continue
+
+            first = stock.stock[0][0]
+            span = (stock.stock[-1][0] - first).days
+
+            lookups = [first + timedelta(days=rnd.randint(0, span)) for _ in range(1000)]
+            ranges = []
+            for length in (30, 365):
+                for _ in range(50):
+                    start = first + timedelta(days=rnd.randint(0, max(0, span - length)))
+                    ranges.append((start, start + timedelta(days=length)))
+
+            print(' %s, %s (%s days)' % (label, storage, len(stock.stock)))
+            time_hot_paths(stock, raw_csv, lookups, ranges, number, storage=storage,
+                           days=len(stock.stock), **params)
+
+def bench_tickers(sizes=(1, 10, 100, 1000, 5000), years=1):
+    section('tickers', 'Many tickers (%s years of daily bars each)' % years)
+
+    raw_csvs = [synthetic_csv(years, seed=i) for i in range(max(sizes))]
+    lookup = datetime(1962, 6, 15)
+
+    for n_tickers in sizes:
+        for storage, columnar in (('list', False), ('columnar', True)):
+            start = time.perf_counter()
+            stocks = [Stock.from_csv('T%s' % i, raw_csvs[i], columnar=columnar)
+                      for i in range(n_tickers)]
+            seconds = time.perf_counter() - start
+            print(' %s tickers, %s' % (n_tickers, storage))
+            report('load', seconds, n_tickers, storage=storage, tickers=n_tickers,
+                   years=years)
+
+            seconds = timeit.timeit(lambda: [stock.close(lookup) for stock in stocks], number=3)
+            report('close lookup', seconds, 3 * n_tickers, storage=storage,
+                   tickers=n_tickers, years=years)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks of Stock hot paths.')
+    parser.add_argument('fixtures', nargs='*',
+                        help='Recorded historical CSV (*.csv) and statistics pages (*.html)')
+    parser.add_argument('--json', default='bench.json',
+                        help='File to write results to (default: bench.json)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Smaller sizes, for a fast check')
+    args = parser.parse_args()
+
+    csvs, pages = load_fixtures(args.fixtures)
+
+    if args.quick:
+        bench_hot_paths((1, 20), csvs, number=2000)
+        bench_tickers((1, 100))
+        bench_stats_parse(pages, number=5)
+    else:
+        bench_csv_ingest()
+        bench_hot_paths(csvs=csvs)
+        bench_tickers()
+        bench_date_index()
+        bench_stats_parse(pages)
+        bench_cross_section()
+        bench_backtest()
+
+    write_results(args.json)
@@ -0,0 +1,203 @@
+from .history import CompactHistory, History, IntradayHistory, np
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Columns of historical data as Arrow sees them
+if pa is not None:
+    SCHEMA = pa.schema([('date', pa.date32()), ('open', pa.float64()), ('high', pa.float64()),
+                        ('low', pa.float64()), ('close', pa.float64()),
+                        ('adj_close', pa.float64()), ('volume', pa.int64())])
+
+    # Intraday bars are dated by the time they start (UTC)
+    INTRADAY_SCHEMA = pa.schema([('time', pa.timestamp('s'))] + list(SCHEMA)[1:])
+
+    # Datasets hold one directory per ticker - <path>/ticker=<TICKER>/
+    PARTITIONING = ds.partitioning(pa.schema([('ticker', pa.string())]), flavor='hive')
+else:
+    SCHEMA = None
+    INTRADAY_SCHEMA = None
+    PARTITIONING = None
+
+def to_record_batch(history):
+    """
+    Convert historical data to an Arrow record batch.
+
+    Columns are handed to Arrow as arrays, never as Python objects. Price and volume columns
+    of a History are shared with Arrow rather than copied, dates are shifted to days since
+    the Unix epoch (date32) in one vectorized pass.
+
+    Intraday bars are dated by a timestamp column, time, instead (INTRADAY_SCHEMA).
+
+    :param history: History instance
+    :returns: pyarrow.RecordBatch with the columns of SCHEMA
+    """
+    _require_arrow()
+
+    if isinstance(history, IntradayHistory):
+        schema = INTRADAY_SCHEMA
+        columns = [pa.array(history.times).view(pa.timestamp('s'))]
+    else:
+        schema = SCHEMA
+        dates = (history.dates - History.EPOCH_ORDINAL).astype(np.int32)
+        columns = [pa.array(dates).view(pa.date32())]
+
+    columns += [pa.array(np.ascontiguousarray(getattr(history, name)), SCHEMA.field(name).type)
+                for name in History.COLUMNS]
+
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+def to_table(history):
+    """
+    Convert historical data to an Arrow table, see to_record_batch().
+
+    :param history: History instance
+    :returns: pyarrow.Table with the columns of SCHEMA
+    """
+    return pa.Table.from_batches([to_record_batch(history)])
+
+def from_table(table, compact=False):
+    """
+    Build historical data from an Arrow table with the columns of SCHEMA, or INTRADAY_SCHEMA
+    for intraday bars. Days are sorted by date if they aren't already.
+
+    :param table: pyarrow.Table or RecordBatch
+    :param compact: Flag to build a CompactHistory (daily bars only)
+    :returns: History instance
+    """
+    _require_arrow()
+
+    intraday = 'time' in table.column_names
+    if intraday:
+        # Parquet has no second resolution, times come back from it in milliseconds
+        dates = table.column('time').cast(pa.timestamp('s')).cast(pa.int64()).to_numpy()
+    else:
+        dates = table.column('date').cast(pa.int32()).to_numpy() + History.EPOCH_ORDINAL
+    columns = [table.column(name).to_numpy() for name in History.COLUMNS]
+
+    if len(dates) > 1 and np.any(dates[1:] < dates[:-1]):
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        columns = [column[order] for column in columns]
+
+    if intraday:
+        return IntradayHistory(dates, *columns)
+
+    history_class = CompactHistory if compact else History
+    return history_class(dates, *columns)
+
+def write_parquet(path, history):
+    """
+    Write historical data to a single Parquet file.
+
+    :param path: Path of the file
+    :param history: History instance
+    """
+    pq.write_table(to_table(history), path)
+
+def write_dataset(path, stocks):
+    """
+    Write stocks to a Parquet dataset partitioned by ticker (hive style, one directory per
+    ticker). Tickers already in the dataset are replaced, other tickers are left as they are.
+
+    The stocks' interval is kept in the files' metadata (see read_intervals), so every stock
+    written at once must have the same interval.
+
+    :param path: Directory of the dataset
+    :param stocks: Iterable of Stock instances
+    """
+    _require_arrow()
+
+    tables = []
+    interval = None
+    for stock in stocks:
+        if interval is None:
+            first, interval = stock.ticker, stock.interval
+        elif stock.interval != interval:
+            raise ValueError('Stocks written together must have the same interval, %s has %s '
+                             'bars and %s has %s bars' % (stock.ticker, stock.interval, first,
+                                                          interval))
+
+        table = to_table(stock.history)
+        tables.append(table.append_column('ticker', pa.repeat(stock.ticker, len(table))))
+
+    if not tables:
+        return
+
+    tables = [table.replace_schema_metadata({'interval' : interval}) for table in tables]
+
+    ds.write_dataset(pa.concat_tables(tables), path, format='parquet',
+                     partitioning=PARTITIONING, max_partitions=len(tables),
+                     existing_data_behavior='delete_matching')
+
+def read_dataset(path, tickers=None, compact=False):
+    """
+    Read historical data back from a Parquet dataset written by write_dataset(). Only the
+    files of the requested tickers are read.
+
+    :param path: Directory of the dataset
+    :param tickers: Tickers to read, defaults to every ticker in the dataset
+    :param compact: Flag to build CompactHistory instances
+    :returns: Dictionary of ticker to History, in the order tickers were given (sorted
+        without tickers). Tickers that aren't in the dataset are left out.
+    """
+    _require_arrow()
+
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+    expression = None
+    if tickers is not None:
+        tickers = [ticker.upper() for ticker in tickers]
+        expression = ds.field('ticker').isin(tickers)
+
+    parts = {}
+    for fragment in dataset.get_fragments(filter=expression):
+        ticker = ds.get_partition_keys(fragment.partition_expression)['ticker']
+        parts.setdefault(ticker, []).append(fragment.to_table())
+
+    if tickers is None:
+        tickers = sorted(parts)
+
+    return {ticker : from_table(pa.concat_tables(parts[ticker]), compact)
+            for ticker in tickers if ticker in parts}
+
+def read_intervals(path, tickers=None):
+    """
+    Read the interval each ticker of a Parquet dataset was written with (see write_dataset).
+    Only the metadata of the files is read.
+
+    :param path: Directory of the dataset
+    :param tickers: Tickers to read, defaults to every ticker in the dataset
+    :returns: Dictionary of ticker to interval, None for files written without one. Tickers
+        that aren't in the dataset are left out.
+    """
+    _require_arrow()
+
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+    expression = None
+    if tickers is not None:
+        expression = ds.field('ticker').isin([ticker.upper() for ticker in tickers])
+
+    intervals = {}
+    for fragment in dataset.get_fragments(filter=expression):
+        ticker = ds.get_partition_keys(fragment.partition_expression)['ticker']
+        metadata = fragment.physical_schema.metadata or {}
+        interval = metadata.get(b'interval')
+        intervals[ticker] = interval.decode('utf-8') if interval else None
+
+    return intervals
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def _require_arrow():
+    """
+    Raise ImportError if PyArrow or NumPy aren't available.
+    """
+    if pa is None or np is None:
+        raise ImportError('PyArrow and NumPy are required for Arrow and Parquet support')
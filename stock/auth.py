@@ -0,0 +1,213 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+class CrumbManager:
+    """
+    Yahoo finance cookie and crumb shared by every thread.
+
+    The cookie/crumb pair is fetched on first use and again whenever Yahoo rejects it. Each
+    pair has a generation number, so when many threads hit an auth failure with the same
+    pair, only the first one to get the lock refreshes it and the rest reuse the new pair.
+
+    Failed requests (connection errors, rate limiting and server errors) are retried with
+    jittered exponential backoff. Counters of refreshes, retries and requests that gave up
+    are kept for monitoring.
+    """
+
+    # Yahoo rejected the cookie/crumb
+    AUTH_FAILURES = (401, 403)
+
+    # Worth trying again later
+    TRANSIENT_FAILURES = (429, 500, 502, 503, 504)
+
+    def __init__(self, refresh, retries=3, backoff=0.5, max_backoff=8.0):
+        """
+        :param refresh: Function returning a new (cookie, crumb) pair.
+        :param retries: Number of times a failed request is retried.
+        :param backoff: Delay before the first retry, in seconds. Doubles every retry.
+        :param max_backoff: Longest delay between retries, in seconds.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._refresh_func = refresh
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._cookie = None
+        self._crumb = None
+        self._generation = 0
+
+        # Counters
+        self.refresh_count = 0
+        self.retry_count = 0
+        self.failure_count = 0
+
+    @property
+    def counters(self):
+        """
+        Snapshot of the counters.
+
+        :returns: Dictionary with 'refreshes', 'retries' and 'failures'
+        """
+        return {'refreshes' : self.refresh_count,
+                'retries' : self.retry_count,
+                'failures' : self.failure_count}
+
+    def current(self):
+        """
+        Get the current cookie and crumb, fetching them if there are none yet.
+
+        :returns: Tuple of (cookie, crumb, generation)
+        """
+        with self._lock:
+            if self._crumb is None:
+                self._refresh()
+
+            return self._cookie, self._crumb, self._generation
+
+    def invalidate(self, generation):
+        """
+        Refresh the cookie and crumb after Yahoo rejected them. Nothing happens if another
+        thread already replaced that generation.
+
+        :param generation: Generation of the rejected pair, as returned by current()
+        """
+        with self._lock:
+            if generation == self._generation:
+                self._refresh()
+
+    def request(self, fetch, authenticate=True):
+        """
+        Make a request, refreshing the cookie/crumb at most once and retrying failures.
+
+        :param fetch: Function taking (cookie, crumb) and returning a requests.Response
+        :param authenticate: False if the request doesn't need a cookie/crumb
+        :returns: Last response, None if the request couldn't be made at all.
+        """
+        refreshed = False
+        attempt = 0
+
+        while True:
+            if authenticate:
+                cookie, crumb, generation = self.current()
+            else:
+                cookie, crumb, generation = None, None, None
+
+            try:
+                response = fetch(cookie, crumb)
+            except requests.RequestException:
+                response = None
+
+            if response is not None:
+                if authenticate and response.status_code in CrumbManager.AUTH_FAILURES \
+                        and not refreshed:
+                    self.invalidate(generation)
+                    refreshed = True
+                    continue
+
+                if response.status_code not in CrumbManager.TRANSIENT_FAILURES:
+                    return response
+
+            if attempt >= self.retries:
+                self._count('failure_count')
+                return response
+
+            self._count('retry_count')
+            self._sleep(attempt)
+            attempt += 1
+
+    async def arequest(self, fetch, authenticate=True):
+        """
+        Coroutine version of request(), for use on an event loop. The cookie/crumb is shared
+        with request(); getting or refreshing it runs in a worker thread, and retries wait
+        without blocking the loop.
+
+        :param fetch: Coroutine function taking (cookie, crumb) and returning a response with
+            a status_code, or None if the request couldn't be made.
+        :param authenticate: False if the request doesn't need a cookie/crumb
+        :returns: Last response, None if the request couldn't be made at all.
+        """
+        loop = asyncio.get_running_loop()
+        refreshed = False
+        attempt = 0
+
+        while True:
+            if authenticate:
+                cookie, crumb, generation = await loop.run_in_executor(None, self.current)
+            else:
+                cookie, crumb, generation = None, None, None
+
+            response = await fetch(cookie, crumb)
+
+            if response is not None:
+                if authenticate and response.status_code in CrumbManager.AUTH_FAILURES \
+                        and not refreshed:
+                    await loop.run_in_executor(None, self.invalidate, generation)
+                    refreshed = True
+                    continue
+
+                if response.status_code not in CrumbManager.TRANSIENT_FAILURES:
+                    return response
+
+            if attempt >= self.retries:
+                self._count('failure_count')
+                return response
+
+            self._count('retry_count')
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    #--------------------------------------------------------------------------
+    # Private functions
+    #----
+
+    def _refresh(self):
+        """
+        Fetch a new cookie/crumb, retrying failures. Must be called with the lock held.
+        """
+        attempt = 0
+
+        while True:
+            try:
+                self._cookie, self._crumb = self._refresh_func()
+                break
+            except (IOError, KeyError):
+                if attempt >= self.retries:
+                    self._count('failure_count')
+                    raise
+
+                self._count('retry_count')
+                self._sleep(attempt)
+                attempt += 1
+
+        self._generation += 1
+        self._count('refresh_count')
+
+    def _count(self, counter):
+        """
+        Increment a counter.
+        """
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _sleep(self, attempt):
+        """
+        Wait before a retry - full jitter exponential backoff.
+
+        :param attempt: Number of retries made so far
+        """
+        time.sleep(self._delay(attempt))
+
+    def _delay(self, attempt):
+        """
+        Full jitter exponential backoff.
+
+        :param attempt: Number of retries made so far
+        :returns: Seconds to wait before the next retry
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
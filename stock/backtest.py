@@ -0,0 +1,210 @@
+from .history import History, np
+
+# Trading days per year, for annualizing
+PERIODS_PER_YEAR = 252
+
+class BacktestResult:
+    """
+    Outcome of a backtest, as arrays aligned with the tested days:
+
+        dates    - int32 date ordinals
+        shares   - shares held over each day (after the open)
+        trades   - shares bought (positive) or sold (negative) at each day's open
+        fills    - price each trade was filled at, including slippage (NaN without a trade)
+        costs    - commission paid each day
+        cash     - cash at each day's close
+        equity   - cash plus shares valued at the close
+    """
+
+    def __init__(self, dates, shares, trades, fills, costs, cash, equity, initial_cash):
+        self.dates = dates
+        self.shares = shares
+        self.trades = trades
+        self.fills = fills
+        self.costs = costs
+        self.cash = cash
+        self.equity = equity
+        self.initial_cash = initial_cash
+
+    @property
+    def returns(self):
+        """
+        Daily returns of equity, the first day is measured from the initial cash.
+        """
+        prev = np.concatenate(([self.initial_cash], self.equity[:-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.equity / prev - 1
+
+    @property
+    def total_return(self):
+        """
+        Return of the whole backtest.
+        """
+        if not len(self.equity):
+            return 0.0
+        return float(self.equity[-1] / self.initial_cash - 1)
+
+    @property
+    def drawdown(self):
+        """
+        Fall of equity from its highest point so far, as a fraction (0 at new highs).
+        """
+        peak = np.maximum.accumulate(np.concatenate(([self.initial_cash], self.equity)))[1:]
+        return 1 - self.equity / peak
+
+    @property
+    def max_drawdown(self):
+        """
+        Largest fall of equity from a previous high, as a fraction.
+        """
+        return float(self.drawdown.max()) if len(self.equity) else 0.0
+
+    @property
+    def trade_count(self):
+        """
+        Number of days a trade was made on.
+        """
+        return int(np.count_nonzero(self.trades))
+
+    def sharpe(self, periods=PERIODS_PER_YEAR):
+        """
+        Annualized Sharpe ratio of daily returns, with a risk free rate of 0.
+
+        :param periods: Number of bars per year
+        :returns: Sharpe ratio, NaN if returns don't vary
+        """
+        returns = self.returns
+        std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+        if not std:
+            return float('nan')
+        return float(returns.mean() / std * np.sqrt(periods))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return 'BacktestResult(%s days, %.2f%% return, %s trades)' \
+               % (len(self), self.total_return * 100, self.trade_count)
+
+class PortfolioResult:
+    """
+    Outcome of backtests of several stocks, each trading its own cash.
+
+        tickers - tickers in the order they were given
+        results - dictionary of ticker to BacktestResult
+        dates   - int32 date ordinals, union of all the stocks' days
+        equity  - combined equity on dates. A stock's equity carries forward over days it
+                  has no bar for, and is its initial cash before its first bar.
+    """
+
+    def __init__(self, results, dates, equity, initial_cash):
+        self.tickers = list(results)
+        self.results = results
+        self.dates = dates
+        self.equity = equity
+        self.initial_cash = initial_cash
+
+    @property
+    def total_return(self):
+        """
+        Return of the whole portfolio.
+        """
+        if not len(self.equity):
+            return 0.0
+        return float(self.equity[-1] / self.initial_cash - 1)
+
+    def __getitem__(self, ticker):
+        return self.results[ticker.upper()]
+
+    def __repr__(self):
+        return 'PortfolioResult(%s tickers, %.2f%% return)' \
+               % (len(self.tickers), self.total_return * 100)
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def backtest(stock, signals, cash=10000.0, commission=0.0, slippage=0.0):
+    """
+    Backtest a stock against target positions, with whole array operations only.
+
+    signals[i] is the number of shares to hold, decided at the close of day i (negative
+    to be short). The difference to the shares held is traded at the open of day i+1, so
+    a signal can only use data up to its own day. The last day's signal is never traded.
+
+    Buys are filled slippage above the open and sells slippage below it. Commission is a
+    fraction of the value traded.
+
+    :param stock: Stock or History instance
+    :param signals: Sequence of target shares, one per day (NaN means no position)
+    :param cash: Cash at the start
+    :param commission: Commission as a fraction of traded value (0.001 is 0.1%)
+    :param slippage: Slippage as a fraction of the open
+    :returns: BacktestResult instance
+    """
+    if np is None:
+        raise ImportError('NumPy is required for backtesting')
+
+    history = stock if isinstance(stock, History) else stock.history
+
+    signals = np.nan_to_num(np.asarray(signals, dtype=np.float64))
+    if len(signals) != len(history):
+        raise ValueError('Expected %s signals, got %s' % (len(history), len(signals)))
+
+    # Position over each day - the previous day's signal, filled at the open
+    shares = np.zeros(len(signals))
+    shares[1:] = signals[:-1]
+
+    trades = np.diff(shares, prepend=0.0)
+    traded = trades != 0
+
+    fills = np.where(traded, history.open * (1 + slippage * np.sign(trades)), np.nan)
+    value = np.where(traded, trades * fills, 0.0)
+    costs = np.abs(value) * commission
+
+    cash_held = cash - np.cumsum(value + costs)
+    equity = cash_held + shares * history.close
+
+    return BacktestResult(history.dates, shares, trades, fills, costs, cash_held, equity, cash)
+
+def backtest_many(stocks, signals, cash=10000.0, commission=0.0, slippage=0.0):
+    """
+    Backtest several stocks, each with its own signals and its own cash, and combine their
+    equity on one calendar. See backtest() for how each stock is traded.
+
+    :param stocks: Iterable of Stock instances
+    :param signals: Dictionary of ticker to signals, or a sequence in the order of stocks
+    :param cash: Cash at the start, per stock
+    :param commission: Commission as a fraction of traded value
+    :param slippage: Slippage as a fraction of the open
+    :returns: PortfolioResult instance
+    """
+    if np is None:
+        raise ImportError('NumPy is required for backtesting')
+
+    stocks = list(stocks)
+    if isinstance(signals, dict):
+        signals = {ticker.upper() : stock_signals for ticker, stock_signals in signals.items()}
+    else:
+        signals = {stock.ticker : stock_signals for stock, stock_signals in zip(stocks, signals)}
+
+    results = {}
+    for stock in stocks:
+        results[stock.ticker] = backtest(stock, signals[stock.ticker], cash, commission,
+                                         slippage)
+
+    if results:
+        dates = np.unique(np.concatenate([result.dates for result in results.values()]))
+    else:
+        dates = np.empty(0, dtype=np.int32)
+
+    equity = np.zeros(len(dates))
+    for result in results.values():
+        if not len(result):
+            equity += cash
+            continue
+
+        # Last bar on or before each date
+        idx = np.searchsorted(result.dates, dates, side='right') - 1
+        equity += np.where(idx >= 0, result.equity[np.maximum(idx, 0)], cash)
+
+    return PortfolioResult(results, dates, equity, cash * len(results))
@@ -0,0 +1,203 @@
+from .history import np
+from .indicators import ewm
+
+class Panel:
+    """
+    History of many stocks aligned on one calendar, so indicators are computed for every
+    stock in a single vectorized pass.
+
+    values is a 2-D array, one row per ticker and one column per date in dates (the union of
+    all the stocks' dates, or times for intraday stocks). Dates a stock has no bar for are NaN
+    in values and False in present.
+
+    Missing bars are handled as follows:
+        - Before a stock's first bar, nothing is defined and windows start at its first bar.
+        - Gaps inside a stock's history carry the last price forward for calculation, so a
+          missing bar counts as a day without a price change.
+        - Every indicator is NaN on dates a stock has no bar for.
+    """
+
+    def __init__(self, stocks, column='close'):
+        """
+        :param stocks: Iterable of Stock instances
+        :param column: History column to calculate indicators from (close, adj_close, ...)
+        """
+        if np is None:
+            raise ImportError('NumPy is required for a stock panel')
+
+        histories = [(stock.ticker, stock.history) for stock in stocks]
+
+        self.tickers = [ticker for ticker, _ in histories]
+        self.column = column
+
+        if histories:
+            self.dates = np.unique(np.concatenate([history.keys for _, history in histories]))
+        else:
+            self.dates = np.empty(0, dtype=np.int32)
+
+        self.values = np.full((len(histories), len(self.dates)), np.nan)
+        for i, (_, history) in enumerate(histories):
+            self.values[i, np.searchsorted(self.dates, history.keys)] = getattr(history, column)
+
+        self.present = ~np.isnan(self.values)
+
+        # Nothing to carry forward before a stock's first bar
+        self._leading = ~np.logical_or.accumulate(self.present, axis=1)
+        self._filled = self._forward_fill(self.values, self.present)
+
+        self._rows = {ticker : i for i, ticker in enumerate(self.tickers)}
+
+    def row(self, ticker):
+        """
+        :param ticker: Stocks ticker
+        :returns: Row of a ticker in values and indicator results
+        """
+        return self._rows[ticker.upper()]
+
+    def sma(self, window):
+        """
+        :param window: Number of days averaged
+        :returns: Simple moving average (tickers x dates)
+        """
+        mean, _ = self._rolling_moments(self._filled, window)
+        return self._mask(mean)
+
+    def ema(self, span):
+        """
+        :param span: Span in days, smoothing factor is 2 / (span + 1)
+        :returns: Exponential moving average seeded with each stock's first bar (tickers x dates)
+        """
+        return self._mask(self._ewm(self._filled, 2.0 / (span + 1)))
+
+    def rsi(self, period=14):
+        """
+        Relative strength index with Wilder's smoothing (1 / period), seeded with each stock's
+        first price change.
+
+        :param period: Number of days
+        :returns: RSI from 0 to 100, NaN for a stock's first period days (tickers x dates)
+        """
+        deltas = np.full(self._filled.shape, np.nan)
+        deltas[:, 1:] = np.diff(self._filled, axis=1)
+
+        gains = self._ewm(np.where(deltas > 0, deltas, np.where(np.isnan(deltas), np.nan, 0)),
+                          1.0 / period)
+        losses = self._ewm(np.where(deltas < 0, -deltas, np.where(np.isnan(deltas), np.nan, 0)),
+                           1.0 / period)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = 100 - 100 / (1 + gains / losses)
+        out[(gains == 0) & (losses == 0)] = 50 # No movement at all
+
+        # Not enough price changes yet
+        out[np.cumsum(~np.isnan(deltas), axis=1) < period] = np.nan
+
+        return self._mask(out)
+
+    def macd(self, fast=12, slow=26, signal=9):
+        """
+        :param fast: Span of the fast EMA
+        :param slow: Span of the slow EMA
+        :param signal: Span of the signal line EMA
+        :returns: Tuple of (MACD line, signal line, histogram), each tickers x dates
+        """
+        line = self._ewm(self._filled, 2.0 / (fast + 1)) - self._ewm(self._filled,
+                                                                   2.0 / (slow + 1))
+        signal_line = self._ewm(line, 2.0 / (signal + 1))
+
+        return self._mask(line), self._mask(signal_line), self._mask(line - signal_line)
+
+    def bollinger(self, window=20, width=2.0):
+        """
+        :param window: Number of days
+        :param width: Number of standard deviations from the middle band
+        :returns: Tuple of (lower, middle, upper) bands, each tickers x dates
+        """
+        mean, std = self._rolling_moments(self._filled, window)
+
+        return (self._mask(mean - width * std), self._mask(mean),
+                self._mask(mean + width * std))
+
+    def zscore(self, window=20):
+        """
+        :param window: Number of days
+        :returns: Distance from the rolling mean in rolling standard deviations (tickers x dates)
+        """
+        mean, std = self._rolling_moments(self._filled, window)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = (self._filled - mean) / std
+        out[std == 0] = np.nan
+
+        return self._mask(out)
+
+    #--------------------------------------------------------------------------
+    # Private functions
+    #----
+
+    def _mask(self, out):
+        """
+        Blank out dates stocks have no bar for.
+        """
+        out[~self.present] = np.nan
+        return out
+
+    def _ewm(self, values, alpha):
+        """
+        Exponentially weighted mean of each row, seeded with its first value that isn't NaN.
+        """
+        valid = ~np.isnan(values)
+        leading = ~np.logical_or.accumulate(valid, axis=1)
+
+        # Stand in the first value for the leading NaNs - the mean stays at that value until
+        # the real data starts
+        first = values[np.arange(len(values)), valid.argmax(axis=1)] if values.size else 0
+        out = ewm(np.where(leading, np.nan_to_num(first)[:, None], values), alpha)
+
+        out[leading] = np.nan
+        return out
+
+    @staticmethod
+    def _forward_fill(values, present):
+        """
+        Carry each row's last value forward over NaNs. Leading NaNs are left alone.
+        """
+        idx = np.where(present, np.arange(values.shape[1]), 0)
+        np.maximum.accumulate(idx, axis=1, out=idx)
+
+        return values[np.arange(len(values))[:, None], idx]
+
+    @staticmethod
+    def _rolling_moments(values, window):
+        """
+        Rolling mean and population standard deviation of each row. NaN unless the whole
+        window has values.
+
+        :returns: Tuple of (mean, std), same shape as values
+        """
+        mean = np.full(values.shape, np.nan)
+        std = np.full(values.shape, np.nan)
+        if values.shape[1] < window:
+            return mean, std
+
+        valid = ~np.isnan(values)
+
+        # Center each row on its first value so the sums don't lose precision
+        first = values[np.arange(len(values)), valid.argmax(axis=1)] if values.size else 0
+        centered = np.where(valid, values - np.nan_to_num(first)[:, None], 0)
+
+        def window_sums(x):
+            sums = np.cumsum(x, axis=1)
+            out = sums[:, window - 1:].copy()
+            out[:, 1:] -= sums[:, :-window]
+            return out
+
+        count = window_sums(valid.astype(np.int64))
+        s1 = window_sums(centered) / window
+        s2 = window_sums(centered * centered) / window
+        full = count == window
+
+        mean[:, window - 1:] = np.where(full, s1 + np.nan_to_num(first)[:, None], np.nan)
+        std[:, window - 1:] = np.where(full, np.sqrt(np.maximum(s2 - s1 * s1, 0)), np.nan)
+
+        return mean, std
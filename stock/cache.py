@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+
+from datetime import datetime
+
+CSV_HEADER = 'Date,Open,High,Low,Close,Adj Close,Volume'
+
+class HistoryCache:
+    """
+    On-disk cache of Yahoo finance historical CSV, one entry per ticker and interval.
+
+    Each entry is the CSV itself (<TICKER>_<interval>.csv) plus a small JSON file recording the
+    date range that has been requested from Yahoo, when it was first downloaded and when it
+    was last extended:
+
+        { "start" : <ordinal>, "end" : <ordinal>, "created" : <unix time>, "updated" : <unix time> }
+
+    When a range is requested, only the parts before the cached start or after the cached
+    end are downloaded and merged into the entry. The cached end never covers the day the
+    data was downloaded on (Yahoo doesn't have that day's data yet), so that day is asked for
+    again once the entry is older than refresh.
+
+    Yahoo recalculates adjusted closes of all past days whenever dividends or splits happen,
+    so entries older than max_age are downloaded again in full rather than extended.
+
+    Once the cache grows beyond max_bytes, least recently used entries are removed.
+    """
+
+    # Used when no location is given
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.stockbot', 'cache')
+
+    def __init__(self, path=None, max_bytes=1024**3, max_age=7*86400, refresh=3600):
+        """
+        :param path: Directory for cache files. Defaults to $STOCKBOT_CACHE or DEFAULT_PATH.
+        :param max_bytes: Size bound for all cached CSV, in bytes.
+        :param max_age: Seconds an entry is extended for before it's downloaded again in full.
+        :param refresh: Seconds before the current day is asked for again.
+        """
+        self.path = path or os.environ.get('STOCKBOT_CACHE') or HistoryCache.DEFAULT_PATH
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.refresh = refresh
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def load(self, ticker, start, end, interval, request):
+        """
+        Get historical CSV for a date range, downloading only what isn't cached.
+
+        :param ticker: Stocks ticker
+        :param start: datetime for start of historical data
+        :param end: datetime for end of historical data
+        :param interval: Interval for data points
+        :param request: Function taking (start, end) datetimes returning CSV, None if failed.
+        :returns: CSV for the requested range, None if a download failed.
+        """
+        csv_path, meta_path = self._entry_paths(ticker, interval)
+        start_ord = start.toordinal()
+        end_ord = end.toordinal()
+        today = datetime.now().toordinal()
+        now = time.time()
+
+        meta = self._read_meta(meta_path)
+        if meta and now - meta['created'] > self.max_age:
+            meta = None # Stale - start over
+
+        days = None
+        if meta:
+            try:
+                with open(csv_path) as f:
+                    days = self._split_days(f.read())
+            except OSError:
+                pass # Evicted by another process
+
+        if days is None:
+            days = {}
+            meta = {'start' : start_ord, 'end' : start_ord - 1, 'created' : now, 'updated' : 0}
+
+        changed = False
+
+        # Head
+        if start_ord < meta['start']:
+            if not self._merge(days, request(start, datetime.fromordinal(meta['start'] - 1))):
+                return None
+            meta['start'] = start_ord
+            changed = True
+
+        # Tail - when only today is missing, don't ask again until it's worth refreshing
+        if end_ord > meta['end'] and (meta['end'] < today - 1 or
+                                      now - meta['updated'] > self.refresh):
+            if not self._merge(days, request(datetime.fromordinal(meta['end'] + 1), end)):
+                return None
+            # Today isn't final yet - refresh from it next time
+            meta['end'] = min(end_ord, today - 1)
+            changed = True
+
+        if changed:
+            meta['updated'] = now
+            self._write(csv_path, meta_path, days, meta)
+            self._evict()
+        else:
+            os.utime(csv_path) # Recently used
+
+        first = datetime.fromordinal(start_ord).strftime('%Y-%m-%d')
+        last = end.strftime('%Y-%m-%d')
+        lines = [days[day] for day in sorted(days) if first <= day[:10] <= last]
+
+        return '\n'.join([CSV_HEADER] + lines) + '\n'
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for name in os.listdir(self.path):
+            os.remove(os.path.join(self.path, name))
+
+    def size(self):
+        """
+        Total size of cached CSV, in bytes.
+        """
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    #--------------------------------------------------------------------------
+    # Private functions
+    #----
+
+    def _entry_paths(self, ticker, interval):
+        """
+        :returns: CSV and meta data file paths for an entry
+        """
+        base = os.path.join(self.path, '%s_%s' % (ticker.upper(), interval))
+        return base + '.csv', base + '.json'
+
+    def _entries(self):
+        """
+        :returns: Paths of all cached CSV files
+        """
+        return [os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.endswith('.csv')]
+
+    def _read_meta(self, meta_path):
+        """
+        :returns: Meta data for an entry, None if it isn't cached.
+        """
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _split_days(self, raw_csv):
+        """
+        Split CSV into a dictionary of lines keyed by date string ('YYYY-MM-DD HH:MM:SS' for
+        intraday bars).
+        """
+        return {line.partition(',')[0] : line for line in raw_csv.split('\n')[1:] if line}
+
+    def _merge(self, days, raw_csv):
+        """
+        Merge downloaded CSV into cached days. Downloaded days replace cached ones.
+
+        :returns: False if the download failed.
+        """
+        if not raw_csv or not raw_csv.startswith(CSV_HEADER):
+            return False
+
+        days.update(self._split_days(raw_csv))
+        return True
+
+    def _write(self, csv_path, meta_path, days, meta):
+        """
+        Write out an entry. Files are replaced atomically so other processes never see a
+        partial entry.
+        """
+        lines = [days[day] for day in sorted(days)]
+        self._replace(csv_path, '\n'.join([CSV_HEADER] + lines) + '\n')
+        self._replace(meta_path, json.dumps(meta))
+
+    def _replace(self, path, text):
+        """
+        Atomically replace a file's contents. Temporary files are named by process and
+        thread, stocks loaded by many threads (Stock.load_many) can write the same entry.
+        """
+        tmp_path = '%s.%s.%s.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        """
+        entries = [(os.path.getmtime(path), os.path.getsize(path), path)
+                   for path in self._entries()]
+        total = sum(entry[1] for entry in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            os.remove(path)
+            try:
+                os.remove(path[:-len('.csv')] + '.json')
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,180 @@
+from datetime import datetime
+
+from .history import History, IntradayHistory, np
+
+class Events:
+    """
+    Dividends and splits of a stock, as compact arrays (oldest first):
+
+        dividend_dates - int32 date ordinals of ex-dividend dates
+        dividends      - float64 dividend per share
+        split_dates    - int32 date ordinals of splits
+        splits         - float64 split ratios, new shares per old share (7:1 is 7.0)
+
+    Adjustments derived from events are cached by their users, generation is increased
+    whenever merge() adds events so they know to recompute.
+    """
+
+    def __init__(self, dividend_dates=(), dividends=(), split_dates=(), splits=()):
+        """
+        :param dividend_dates: Sequence of ex-dividend date ordinals
+        :param dividends: Sequence of dividends per share
+        :param split_dates: Sequence of split date ordinals
+        :param splits: Sequence of split ratios
+        """
+        if np is None:
+            raise ImportError('NumPy is required for dividend and split events')
+
+        self.dividend_dates, self.dividends = _sort_events(dividend_dates, dividends)
+        self.split_dates, self.splits = _sort_events(split_dates, splits)
+
+        self.generation = 0
+
+    @classmethod
+    def from_csv(cls, dividend_csv=None, split_csv=None):
+        """
+        Build events from Yahoo finance CSV downloaded with events=div and events=split.
+
+            Date,Dividends          Date,Stock Splits
+            2017-05-10,0.63         2014-06-09,7/1
+
+        :param dividend_csv: string CSV of dividends
+        :param split_csv: string CSV of splits
+        :returns: Events instance
+        """
+        dividend_dates, dividends = _parse_events(dividend_csv, float)
+        split_dates, splits = _parse_events(split_csv, parse_ratio)
+
+        return cls(dividend_dates, dividends, split_dates, splits)
+
+    def merge(self, other):
+        """
+        Add events that aren't known yet.
+
+        :param other: Events instance, usually freshly downloaded
+        :returns: True if any events were added
+        """
+        new_dividends = ~np.isin(other.dividend_dates, self.dividend_dates)
+        new_splits = ~np.isin(other.split_dates, self.split_dates)
+
+        if not new_dividends.any() and not new_splits.any():
+            return False
+
+        self.dividend_dates, self.dividends = _sort_events(
+            np.concatenate((self.dividend_dates, other.dividend_dates[new_dividends])),
+            np.concatenate((self.dividends, other.dividends[new_dividends])))
+        self.split_dates, self.splits = _sort_events(
+            np.concatenate((self.split_dates, other.split_dates[new_splits])),
+            np.concatenate((self.splits, other.splits[new_splits])))
+
+        self.generation += 1
+        return True
+
+    def last_date(self):
+        """
+        :returns: Date ordinal of the latest event, None if there are none
+        """
+        last = [events[-1] for events in (self.dividend_dates, self.split_dates) if len(events)]
+        return int(max(last)) if last else None
+
+    def split_factors(self, dates):
+        """
+        Cumulative split ratio after each day. Yahoo finance prices are already divided by it
+        (and volumes multiplied), multiply prices by it for what they traded at that day.
+
+        :param dates: Array of date ordinals (oldest first)
+        :returns: Array of factors aligned with dates
+        """
+        return _factors_after(self.split_dates, self.splits, dates)
+
+    def dividend_factors(self, dates, close):
+        """
+        Cumulative dividend adjustment after each day, the same way Yahoo calculates adjusted
+        closes: every ex-dividend date scales all earlier prices by 1 - dividend / close of
+        the day before it.
+
+        :param dates: Array of date ordinals (oldest first)
+        :param close: Split adjusted closing prices aligned with dates (as Yahoo gives them)
+        :returns: Array of factors aligned with dates
+        """
+        # Day before each ex-dividend date, dividends before the first day don't matter
+        prev = np.searchsorted(dates, self.dividend_dates) - 1
+        known = prev >= 0
+
+        multipliers = 1 - self.dividends[known] / close[prev[known]]
+
+        return _factors_after(self.dividend_dates[known], multipliers, dates)
+
+    def __len__(self):
+        return len(self.dividend_dates) + len(self.split_dates)
+
+    def __repr__(self):
+        return 'Events(%s dividends, %s splits)' % (len(self.dividends), len(self.splits))
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def adjust(history, dividend_factors):
+    """
+    Adjust history for dividends in one vectorized pass. Yahoo finance prices and volumes
+    are already split adjusted, so they're kept and only adj_close is calculated.
+
+    :param history: History instance
+    :param dividend_factors: Array from Events.dividend_factors
+    :returns: History with adj_close adjusted for splits and dividends (total return)
+    """
+    # Adjusted prices aren't whole cents, so compact history is adjusted into floats
+    history_class = IntradayHistory if isinstance(history, IntradayHistory) else History
+
+    return history_class(history.keys, np.array(history.open), np.array(history.high),
+                         np.array(history.low), np.array(history.close),
+                         history.close * dividend_factors, np.array(history.volume))
+
+def parse_ratio(ratio):
+    """
+    Parse a Yahoo split ratio - '7/1' or '7:1'.
+
+    :param ratio: Ratio string
+    :returns: New shares per old share
+    """
+    new, _, old = ratio.replace(':', '/').partition('/')
+    return float(new) / float(old or 1)
+
+def _parse_events(raw_csv, parse_value):
+    """
+    Parse Yahoo finance events CSV into date ordinals and values.
+    """
+    dates = []
+    values = []
+
+    if raw_csv:
+        for line in raw_csv.split('\n')[1:]: # Exclude header
+            if not line or 'null' in line:
+                continue
+
+            date, value = line.split(',')[:2]
+            dates.append(datetime(int(date[0:4]), int(date[5:7]), int(date[8:10])).toordinal())
+            values.append(parse_value(value))
+
+    return dates, values
+
+def _sort_events(dates, values):
+    """
+    Events as arrays sorted by date - Yahoo doesn't send them in order.
+    """
+    dates = np.asarray(dates, dtype=np.int32)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(dates, kind='stable')
+
+    return dates[order], values[order]
+
+def _factors_after(event_dates, values, dates):
+    """
+    Product of the values of all events after each day.
+    """
+    # after[k] - product of values from event k on
+    after = np.ones(len(values) + 1)
+    after[:-1] = np.cumprod(values[::-1])[::-1]
+
+    # Number of events on or before each day
+    return after[np.searchsorted(event_dates, dates, side='right')]
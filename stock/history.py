@@ -0,0 +1,546 @@
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class History:
+    """
+    Columnar storage for Yahoo finance historical data.
+
+    Rather than keeping every day as [datetime, (open, high, low, close, adj_close, volume)],
+    each field is kept in its own contiguous NumPy array:
+
+        dates     - int32 proleptic Gregorian ordinals (datetime.toordinal())
+        open      - float64
+        high      - float64
+        low       - float64
+        close     - float64
+        adj_close - float64
+        volume    - int64
+
+    Indexing with an integer still returns a day in the original list format so existing
+    callers don't notice the difference. Slicing returns a History viewing the same memory,
+    and indexing with an array of indexes returns a History of those days.
+
+    New days can be appended in place (see append). Columns then live in buffers with spare
+    capacity that double when full, so appending is amortized O(1) per day.
+    """
+
+    # Column order matches Stock.OPEN_IDX ... Stock.VOLUME_IDX
+    COLUMNS = ('open', 'high', 'low', 'close', 'adj_close', 'volume')
+
+    # Attributes the data is stored in
+    STORAGE = ('dates',) + COLUMNS
+
+    # Attribute days are sorted and looked up by
+    KEY = 'dates'
+
+    # Ordinal of the Unix epoch - datetime64[D] values count days from here
+    EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+    # Row layout of Yahoo finance historical CSV
+    CSV_DTYPE = [('date', 'datetime64[D]'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'),
+                 ('close', 'f8'), ('adj_close', 'f8'), ('volume', 'i8')]
+
+    def __init__(self, dates, open, high, low, close, adj_close, volume):
+        """
+        :param dates: Sequence of date ordinals (oldest first)
+        :param open: Sequence of opening prices
+        :param high: Sequence of high prices
+        :param low: Sequence of low prices
+        :param close: Sequence of closing prices
+        :param adj_close: Sequence of adjusted closing prices
+        :param volume: Sequence of daily volumes
+        """
+        if np is None:
+            raise ImportError('NumPy is required for columnar stock history')
+
+        self.dates = np.asarray(dates, dtype=np.int32)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.adj_close = np.asarray(adj_close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+        # Own buffers with spare capacity, created on first append
+        self._buffers = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build columns from the list based day format.
+
+        :param rows: List of [datetime, (open, high, low, close, adj_close, volume)]
+        :returns: History instance
+        """
+        dates = [cls.to_key(day[0]) for day in rows]
+        values = [day[1] for day in rows]
+
+        if values:
+            columns = list(zip(*values))
+        else:
+            columns = [()] * len(cls.COLUMNS)
+
+        return cls(dates, *columns)
+
+    @classmethod
+    def from_csv(cls, raw_csv):
+        """
+        Parse Yahoo finance CSV straight into columns in a single pass.
+
+        Dates are fixed format (YYYY-MM-DD) and all conversion is done by NumPy's C parser
+        rather than per line in Python. Prices are rounded to 2 decimal points like
+        Stock._parse_day_str. Days Yahoo reports as 'null' are dropped.
+
+        :param raw_csv: string CSV as returned from yahoo finance
+        :returns: History instance
+        """
+        if np is None:
+            raise ImportError('NumPy is required for columnar stock history')
+
+        lines = raw_csv.partition('\n')[2].splitlines() # Exclude header
+
+        if 'null' in raw_csv:
+            lines = [line for line in lines if 'null' not in line]
+
+        if not lines:
+            return cls([], [], [], [], [], [], [])
+
+        data = np.loadtxt(lines, delimiter=',', dtype=cls.CSV_DTYPE, ndmin=1)
+
+        return cls(cls._csv_keys(data['date']),
+                   round_prices(data['open']), round_prices(data['high']),
+                   round_prices(data['low']), round_prices(data['close']),
+                   round_prices(data['adj_close']), np.ascontiguousarray(data['volume']))
+
+    def append(self, days):
+        """
+        Append new days in place.
+
+        Days before the current last day are ignored, and a day on the current last day
+        replaces it (it may have been downloaded before the market closed).
+
+        Existing views (slices, memoryviews) of the columns aren't updated, get the columns
+        again after appending.
+
+        :param days: History of new days (oldest first)
+        :returns: Index of the first day added or replaced, None if nothing changed.
+        """
+        length = len(self)
+        start = length
+
+        if days.KEY != self.KEY:
+            raise ValueError('Can not append %s to %s' % (type(days).__name__,
+                                                          type(self).__name__))
+
+        if length:
+            days = days[int(np.searchsorted(days.keys, self.keys[-1])):]
+            if len(days) and days.keys[0] == self.keys[-1]:
+                start -= 1
+
+        if not len(days):
+            return None
+
+        if not isinstance(days, type(self)):
+            days = type(self)(days.keys, days.open, days.high, days.low, days.close,
+                              days.adj_close, days.volume)
+
+        if self._buffers is None:
+            # Columns may be views of memory we don't own - copy them out first
+            self._buffers = {name : np.array(getattr(self, name)) for name in self.STORAGE}
+
+        end = start + len(days)
+        for name in self._buffers:
+            buffer = self._buffers[name] = reserve(self._buffers[name], end)
+            buffer[start:end] = getattr(days, name)
+            setattr(self, name, buffer[:end])
+
+        return start
+
+    @property
+    def keys(self):
+        """
+        Column days are sorted and looked up by - dates, or times of intraday bars.
+        """
+        return getattr(self, self.KEY)
+
+    @staticmethod
+    def to_key(date):
+        """
+        Convert a datetime to a key (see keys).
+
+        :param date: datetime or date instance
+        :returns: Date ordinal
+        """
+        return date.toordinal()
+
+    @staticmethod
+    def to_datetime(key):
+        """
+        Convert a key (see keys) back to a datetime.
+
+        :param key: Date ordinal
+        :returns: datetime instance
+        """
+        return datetime.fromordinal(key)
+
+    def column(self, idx):
+        """
+        Get a data column by its day tuple index (Stock.OPEN_IDX, Stock.CLOSE_IDX, ...).
+
+        :param idx: Index of data piece
+        :returns: NumPy array for the column
+        """
+        return getattr(self, History.COLUMNS[idx])
+
+    def day(self, idx):
+        """
+        Get a single day in the list based format.
+
+        :param idx: Index of day
+        :returns: [datetime, (open, high, low, close, adj_close, volume)]
+        """
+        return [self.to_datetime(int(self.keys[idx])),
+                (float(self.open[idx]), float(self.high[idx]), float(self.low[idx]),
+                 float(self.close[idx]), float(self.adj_close[idx]), int(self.volume[idx]))]
+
+    def rows(self):
+        """
+        Convert back to the list based format.
+
+        :returns: List of [datetime, (open, high, low, close, adj_close, volume)]
+        """
+        return [self.day(i) for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, key):
+        if isinstance(key, (slice, np.ndarray)):
+            # Basic slicing on NumPy arrays is a view - no data is copied. Index arrays pick
+            # out days (copied).
+            history = type(self).__new__(type(self))
+            for name in self.STORAGE:
+                setattr(history, name, getattr(self, name)[key])
+            history._buffers = None
+
+            return history
+
+        return self.day(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.day(i)
+
+    def __repr__(self):
+        return 'History(%s days)' % len(self)
+
+    @classmethod
+    def _csv_keys(cls, dates):
+        """
+        Convert the parsed date column of CSV to keys.
+        """
+        return dates.astype(np.int32) + cls.EPOCH_ORDINAL
+
+class IntradayHistory(History):
+    """
+    History of intraday bars (1m, 5m, 15m, 1h), kept by time rather than by day:
+
+        times     - int64 Unix timestamps (seconds, UTC) of the start of each bar
+        open      - float64
+        high      - float64
+        low       - float64
+        close     - float64
+        adj_close - float64
+        volume    - int64
+
+    Bars are sorted and looked up by times. dates is computed from times (the UTC day of
+    each bar), so what works by day - resampling, dividends and splits - works on intraday
+    bars too. Bars in the list based format are dated with naive UTC datetimes.
+
+    Intraday CSV is laid out like daily CSV, dated 'YYYY-MM-DD HH:MM:SS' (UTC).
+    """
+
+    STORAGE = ('times',) + History.COLUMNS
+
+    KEY = 'times'
+
+    CSV_DTYPE = [('date', 'datetime64[s]')] + History.CSV_DTYPE[1:]
+
+    EPOCH = datetime(1970, 1, 1)
+
+    def __init__(self, times, open, high, low, close, adj_close, volume):
+        """
+        :param times: Sequence of Unix timestamps (oldest first)
+        :param open: Sequence of opening prices
+        :param high: Sequence of high prices
+        :param low: Sequence of low prices
+        :param close: Sequence of closing prices
+        :param adj_close: Sequence of adjusted closing prices
+        :param volume: Sequence of volumes
+        """
+        if np is None:
+            raise ImportError('NumPy is required for columnar stock history')
+
+        self.times = np.asarray(times, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.adj_close = np.asarray(adj_close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+        self._buffers = None
+
+    @property
+    def dates(self):
+        return (self.times // 86400 + History.EPOCH_ORDINAL).astype(np.int32)
+
+    @staticmethod
+    def to_key(date):
+        """
+        :param date: datetime (naive datetimes are UTC) or date instance
+        :returns: Unix timestamp
+        """
+        if not isinstance(date, datetime):
+            date = datetime(date.year, date.month, date.day)
+        elif date.tzinfo is not None:
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return (date - IntradayHistory.EPOCH) // timedelta(seconds=1)
+
+    @staticmethod
+    def to_datetime(key):
+        """
+        :param key: Unix timestamp
+        :returns: Naive UTC datetime
+        """
+        return IntradayHistory.EPOCH + timedelta(seconds=key)
+
+    def __repr__(self):
+        return 'IntradayHistory(%s bars)' % len(self)
+
+    @classmethod
+    def _csv_keys(cls, times):
+        return times.astype(np.int64)
+
+class CompactHistory(History):
+    """
+    History stored as fixed point integers, for holding many stocks in memory.
+
+    Prices are already rounded to 2 decimal points, so they're kept exactly as int32 cents
+    (prices up to 21,474,836.47). Volume stays int64 and dates int32 ordinals, 32 bytes per
+    day in all:
+
+        dates           - int32 proleptic Gregorian ordinals
+        open_ticks      - int32 cents
+        high_ticks      - int32 cents
+        low_ticks       - int32 cents
+        close_ticks     - int32 cents
+        adj_close_ticks - int32 cents
+        volume          - int64
+
+    Prices are only converted to floats when they're read. open, close, ... are float64
+    arrays computed on access (slice first to convert less), and single days are Bar views.
+    """
+
+    # Ticks per unit of price
+    SCALE = 100
+
+    STORAGE = ('dates', 'open_ticks', 'high_ticks', 'low_ticks', 'close_ticks',
+               'adj_close_ticks', 'volume')
+
+    def __init__(self, dates, open, high, low, close, adj_close, volume):
+        """
+        :param dates: Sequence of date ordinals (oldest first)
+        :param open: Sequence of opening prices
+        :param high: Sequence of high prices
+        :param low: Sequence of low prices
+        :param close: Sequence of closing prices
+        :param adj_close: Sequence of adjusted closing prices
+        :param volume: Sequence of daily volumes
+        """
+        if np is None:
+            raise ImportError('NumPy is required for columnar stock history')
+
+        self.dates = np.asarray(dates, dtype=np.int32)
+        self.open_ticks = to_ticks(open, CompactHistory.SCALE)
+        self.high_ticks = to_ticks(high, CompactHistory.SCALE)
+        self.low_ticks = to_ticks(low, CompactHistory.SCALE)
+        self.close_ticks = to_ticks(close, CompactHistory.SCALE)
+        self.adj_close_ticks = to_ticks(adj_close, CompactHistory.SCALE)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+        self._buffers = None
+
+    @property
+    def open(self):
+        return self.open_ticks / CompactHistory.SCALE
+
+    @property
+    def high(self):
+        return self.high_ticks / CompactHistory.SCALE
+
+    @property
+    def low(self):
+        return self.low_ticks / CompactHistory.SCALE
+
+    @property
+    def close(self):
+        return self.close_ticks / CompactHistory.SCALE
+
+    @property
+    def adj_close(self):
+        return self.adj_close_ticks / CompactHistory.SCALE
+
+    def day(self, idx):
+        """
+        Get a single day as a Bar view.
+
+        :param idx: Index of day
+        :returns: Bar instance
+        """
+        return Bar(self, range(len(self))[idx])
+
+    def rows(self):
+        """
+        Convert back to the list based format.
+
+        :returns: List of [datetime, (open, high, low, close, adj_close, volume)]
+        """
+        return [Bar(self, i).as_list() for i in range(len(self))]
+
+    def __repr__(self):
+        return 'CompactHistory(%s days)' % len(self)
+
+class Bar:
+    """
+    View of one day of a CompactHistory. Fields are read from the history's columns and
+    converted to floats when they're accessed.
+
+    Indexes like the list based day format, so bar[0] is the datetime and bar[1] the tuple
+    (open, high, low, close, adj_close, volume).
+    """
+
+    __slots__ = ('history', 'index')
+
+    def __init__(self, history, index):
+        """
+        :param history: CompactHistory instance
+        :param index: Index of the day
+        """
+        self.history = history
+        self.index = index
+
+    @property
+    def date(self):
+        return datetime.fromordinal(int(self.history.dates[self.index]))
+
+    @property
+    def open(self):
+        return int(self.history.open_ticks[self.index]) / CompactHistory.SCALE
+
+    @property
+    def high(self):
+        return int(self.history.high_ticks[self.index]) / CompactHistory.SCALE
+
+    @property
+    def low(self):
+        return int(self.history.low_ticks[self.index]) / CompactHistory.SCALE
+
+    @property
+    def close(self):
+        return int(self.history.close_ticks[self.index]) / CompactHistory.SCALE
+
+    @property
+    def adj_close(self):
+        return int(self.history.adj_close_ticks[self.index]) / CompactHistory.SCALE
+
+    @property
+    def volume(self):
+        return int(self.history.volume[self.index])
+
+    def values(self):
+        """
+        :returns: (open, high, low, close, adj_close, volume)
+        """
+        return (self.open, self.high, self.low, self.close, self.adj_close, self.volume)
+
+    def as_list(self):
+        """
+        :returns: [datetime, (open, high, low, close, adj_close, volume)]
+        """
+        return [self.date, self.values()]
+
+    def __getitem__(self, key):
+        return self.as_list()[key]
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        return iter(self.as_list())
+
+    def __eq__(self, other):
+        if isinstance(other, (Bar, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'Bar(%s, %s)' % (self.date.strftime('%Y-%m-%d'), self.values())
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def to_ticks(prices, scale):
+    """
+    Convert prices to int32 fixed point.
+
+    :param prices: Sequence of prices
+    :param scale: Ticks per unit of price
+    :returns: int32 array
+    """
+    ticks = np.rint(np.asarray(prices, dtype=np.float64) * scale)
+
+    if len(ticks) and np.abs(ticks).max() > np.iinfo(np.int32).max:
+        raise ValueError('Prices too large for compact storage')
+
+    return ticks.astype(np.int32)
+
+def round_prices(prices):
+    """
+    Round prices to 2 decimal points, matching Python's round() exactly.
+
+    NumPy rounds by scaling by 100 first, which can land on the other side of a half way
+    point than Python's correctly rounded round(). Those few values are redone in Python.
+
+    :param prices: NumPy array of prices
+    :returns: New array of rounded prices
+    """
+    rounded = prices.round(2)
+
+    scaled = prices * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(prices[i]), 2)
+
+    return rounded
+
+def reserve(buffer, size):
+    """
+    Make sure a buffer can hold size items. Capacity is at least doubled when a buffer has to
+    grow, so filling it one item at a time is amortized O(1).
+
+    :param buffer: NumPy array
+    :param size: Number of items needed
+    :returns: buffer, or a bigger copy of it
+    """
+    if len(buffer) >= size:
+        return buffer
+
+    grown = np.empty(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
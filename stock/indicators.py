@@ -0,0 +1,260 @@
+from .history import np, reserve
+
+class Indicators:
+    """
+    Indicators precomputed once from a stock's history, for stocks created with advanced=True.
+
+    Every indicator is a NumPy array aligned with the stock's days (oldest first). Days an
+    indicator isn't defined for yet (the first day of returns, the first window-1 days of a
+    moving average, ...) are NaN.
+
+        returns            - daily returns of adjusted closes
+        log_returns        - daily log returns of adjusted closes
+        cumulative_returns - return of adjusted close since the first day
+        true_range         - true range from high, low and previous close
+        sma(window)        - simple moving average of closes
+        ema(span)          - exponential moving average of closes
+        volatility(window) - rolling standard deviation of daily returns
+
+    Moving averages and volatilities for the windows in SMA_WINDOWS, EMA_SPANS and
+    VOLATILITY_WINDOWS are computed up front, any other window is computed on first use and
+    kept.
+
+    When days are appended to the history, update() only computes the new days. Each one
+    costs at most a window's worth of work no matter how long the history is.
+    """
+
+    SMA_WINDOWS = (20, 50, 200)
+    EMA_SPANS = (12, 26)
+    VOLATILITY_WINDOWS = (20,)
+
+    def __init__(self, history):
+        """
+        :param history: History instance
+        """
+        self.history = history
+
+        # Indicator key - ('returns',), ('sma', window), ... - to buffer with spare capacity
+        self._buffers = {}
+
+        self.update(0)
+
+        for window in Indicators.SMA_WINDOWS:
+            self.sma(window)
+        for span in Indicators.EMA_SPANS:
+            self.ema(span)
+        for window in Indicators.VOLATILITY_WINDOWS:
+            self.volatility(window)
+
+    def update(self, start):
+        """
+        Compute indicators from day start on, after days were appended to (or replaced at
+        the end of) the history.
+
+        :param start: Index of the first new day
+        """
+        history = self.history
+        length = len(history)
+        prev = max(start - 1, 0)
+        skip = 1 if start else 0
+
+        self.returns = self._store(('returns',), start,
+                                   returns(history.adj_close[prev:])[skip:])
+        self.log_returns = self._store(('log_returns',), start,
+                                       log_returns(history.adj_close[prev:])[skip:])
+        self.cumulative_returns = self._store(
+            ('cumulative_returns',), start,
+            cumulative_returns(history.adj_close[start:], history.adj_close[0]) if length
+            else np.empty(0))
+        self.true_range = self._store(('true_range',), start,
+                                      true_range(history.high[prev:], history.low[prev:],
+                                                 history.close[prev:])[skip:])
+
+        for key in list(self._buffers):
+            if key[0] == 'sma':
+                self._update_sma(key[1], start)
+            elif key[0] == 'ema':
+                self._update_ema(key[1], start)
+            elif key[0] == 'volatility':
+                self._update_volatility(key[1], start)
+
+    def sma(self, window):
+        """
+        :param window: Number of days averaged
+        :returns: Simple moving average of closes
+        """
+        if ('sma', window) not in self._buffers:
+            return self._update_sma(window, 0)
+        return self._view(('sma', window))
+
+    def ema(self, span):
+        """
+        :param span: Span in days, smoothing factor is 2 / (span + 1)
+        :returns: Exponential moving average of closes
+        """
+        if ('ema', span) not in self._buffers:
+            return self._update_ema(span, 0)
+        return self._view(('ema', span))
+
+    def volatility(self, window):
+        """
+        :param window: Number of days
+        :returns: Rolling standard deviation of daily returns
+        """
+        if ('volatility', window) not in self._buffers:
+            return self._update_volatility(window, 0)
+        return self._view(('volatility', window))
+
+    #--------------------------------------------------------------------------
+    # Private functions
+    #----
+
+    def _update_sma(self, window, start):
+        first = max(start - window + 1, 0)
+        values = sma(self.history.close[first:], window)
+        return self._store(('sma', window), start, values[start - first:])
+
+    def _update_ema(self, span, start):
+        if start:
+            # Continue the recursion from the previous day
+            seed = self._buffers[('ema', span)][start - 1:start]
+            values = ema(np.concatenate((seed, self.history.close[start:])), span)[1:]
+        else:
+            values = ema(self.history.close, span)
+        return self._store(('ema', span), start, values)
+
+    def _update_volatility(self, window, start):
+        first = max(start - window + 1, 0)
+        values = rolling_std(self.returns[first:], window)
+        return self._store(('volatility', window), start, values[start - first:])
+
+    def _store(self, key, start, values):
+        """
+        Write an indicator's values from day start on.
+
+        :returns: View of the indicator for all days
+        """
+        end = start + len(values)
+        buffer = self._buffers[key] = reserve(self._buffers.get(key, np.empty(0)), end)
+        buffer[start:end] = values
+        return buffer[:end]
+
+    def _view(self, key):
+        """
+        :returns: View of the indicator for all days
+        """
+        return self._buffers[key][:len(self.history)]
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def returns(prices):
+    """
+    :param prices: Array of prices
+    :returns: Daily returns, NaN for the first day
+    """
+    out = np.full(len(prices), np.nan)
+    out[1:] = prices[1:] / prices[:-1] - 1
+    return out
+
+def log_returns(prices):
+    """
+    :param prices: Array of prices
+    :returns: Daily log returns, NaN for the first day
+    """
+    out = np.full(len(prices), np.nan)
+    out[1:] = np.log(prices[1:] / prices[:-1])
+    return out
+
+def cumulative_returns(prices, first):
+    """
+    :param prices: Array of prices
+    :param first: Price of the first day, returns are measured from it
+    :returns: Return since the first day
+    """
+    return prices / first - 1
+
+def true_range(high, low, close):
+    """
+    :param high: Array of high prices
+    :param low: Array of low prices
+    :param close: Array of closing prices
+    :returns: True range - high minus low for the first day
+    """
+    out = np.asarray(high - low, dtype=np.float64)
+    prev_close = close[:-1]
+    out[1:] = np.maximum(out[1:], np.maximum(np.abs(high[1:] - prev_close),
+                                             np.abs(low[1:] - prev_close)))
+    return out
+
+def sma(values, window):
+    """
+    :param values: Array of values
+    :param window: Number of values averaged
+    :returns: Simple moving average, NaN for the first window-1 values
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+def ema(values, span):
+    """
+    Exponential moving average seeded with the first value.
+
+    The recursion is unrolled into its closed form, a cumulative sum of values weighted by
+    powers of the decay. Weights are only exact while decay**-n stays small, so the closed
+    form is applied to blocks and each block continues from the last value of the previous.
+
+    Arrays with more than one dimension are averaged along the last axis.
+
+    :param values: Array of values
+    :param span: Span, smoothing factor is 2 / (span + 1)
+    :returns: Exponential moving average
+    """
+    return ewm(values, 2.0 / (span + 1))
+
+def ewm(values, alpha):
+    """
+    Exponentially weighted mean along the last axis, seeded with the first value.
+
+    :param values: Array of values
+    :param alpha: Smoothing factor
+    :returns: Exponentially weighted mean
+    """
+    decay = 1 - alpha
+    if decay <= 0:
+        return np.array(values, dtype=np.float64)
+
+    out = np.empty(values.shape)
+    if not values.shape[-1]:
+        return out
+
+    # Largest block with weights within 1e6 of each other
+    block = max(1, int(np.log(1e6) / -np.log(decay)))
+    powers = decay ** np.arange(1, block + 1)    # decay**(t+1)
+    weights = decay ** -np.arange(0, block)      # decay**-k
+
+    prev = values[..., :1]
+    for start in range(0, values.shape[-1], block):
+        x = values[..., start:start + block]
+        n = x.shape[-1]
+        out[..., start:start + n] = (alpha / decay * powers[:n]
+                                     * np.cumsum(x * weights[:n], axis=-1)
+                                     + powers[:n] * prev)
+        prev = out[..., start + n - 1:start + n]
+
+    return out
+
+def rolling_std(values, window):
+    """
+    :param values: Array of values
+    :param window: Number of values
+    :returns: Rolling sample standard deviation, NaN until a full window is available
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1:] = windows.std(axis=1, ddof=1)
+    return out
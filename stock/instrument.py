@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds of latency histogram buckets, in seconds - 1us doubling up to ~134s
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** k for k in range(28))
+
+class Instruments:
+    """
+    Timing of the phases stocks go through, shared by all stocks as Stock.instruments:
+
+        fetch    - requests to the data source (prices, events, statistics)
+        parse    - parsing historical CSV
+        index    - building the date index
+        advanced - building the advanced structure (indicators)
+        stats    - parsing the statistics page
+        lookup   - date and range lookups (day_info, open, close, ...)
+
+    Each phase keeps a count, total/min/max seconds and a latency histogram with buckets
+    doubling from 1us. Callbacks are called with every timing, to forward them elsewhere.
+
+    Nothing is recorded until enabled is set, so instrumentation costs nothing otherwise.
+    """
+
+    PHASES = ('fetch', 'parse', 'index', 'advanced', 'stats', 'lookup')
+
+    def __init__(self, enabled=False):
+        """
+        :param enabled: Flag to start recording right away
+        """
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all counters and histograms.
+        """
+        with self._lock:
+            self._phases = {phase : _new_phase() for phase in Instruments.PHASES}
+
+    def add_callback(self, callback):
+        """
+        Call a function with every timing recorded.
+
+        :param callback: Function taking (phase, seconds, info) - info is a dictionary of
+            details such as the ticker.
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        :param callback: Function given to add_callback
+        """
+        self._callbacks.remove(callback)
+
+    @contextmanager
+    def time(self, phase, **info):
+        """
+        Time a block as a phase. Does nothing unless enabled.
+
+        :param phase: Name of the phase
+        :param info: Details passed on to callbacks
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, **info)
+
+    def record(self, phase, seconds, **info):
+        """
+        Record a timing.
+
+        :param phase: Name of the phase
+        :param seconds: Time taken
+        :param info: Details passed on to callbacks
+        """
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = _new_phase()
+
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['min'] = min(stats['min'], seconds)
+            stats['max'] = max(stats['max'], seconds)
+            stats['buckets'][bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+        for callback in self._callbacks:
+            callback(phase, seconds, info)
+
+    def snapshot(self):
+        """
+        Copy of the counters of every phase that has timings:
+
+            { <phase> : { 'count', 'total', 'mean', 'min', 'max' (seconds),
+                          'histogram' : [[<upper bound in seconds or None>, <count>], ...] } }
+
+        Histograms only list buckets with timings in them, None is the bucket above the
+        largest bound.
+        """
+        with self._lock:
+            out = {}
+            for phase, stats in self._phases.items():
+                if not stats['count']:
+                    continue
+
+                bounds = BUCKET_BOUNDS + (None,)
+                out[phase] = {
+                    'count' : stats['count'],
+                    'total' : stats['total'],
+                    'mean' : stats['total'] / stats['count'],
+                    'min' : stats['min'],
+                    'max' : stats['max'],
+                    'histogram' : [[bounds[i], count]
+                                   for i, count in enumerate(stats['buckets']) if count],
+                }
+
+        return out
+
+    def write(self, path):
+        """
+        Write a snapshot out as JSON.
+
+        :param path: Path of the file
+        """
+        with open(path, 'w') as f:
+            json.dump({'created' : time.time(), 'phases' : self.snapshot()}, f, indent=1)
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def _new_phase():
+    """
+    Empty counters of a phase.
+    """
+    return {'count' : 0, 'total' : 0.0, 'min' : float('inf'), 'max' : 0.0,
+            'buckets' : [0] * (len(BUCKET_BOUNDS) + 1)}
@@ -0,0 +1,85 @@
+import re
+
+from .history import History, IntradayHistory, np
+
+# Periods bars can be resampled to, by name - N day bars are given as '<N>d'
+PERIODS = {
+    '1wk' : 'week',
+    '1mo' : 'month',
+    '3mo' : 'quarter',
+    'weekly' : 'week',
+    'monthly' : 'month',
+    'quarterly' : 'quarter',
+}
+
+DAYS_REGEX = re.compile(r'^(\d+)d$')
+
+def resample(history, interval):
+    """
+    Combine daily bars into bars of a longer interval in one vectorized pass. Intraday bars
+    are combined by their day, so '1d' turns them into daily bars.
+
+    Bars are dated by their first trading day, intraday bars included, so looking up any day
+    of a period finds the period's bar. Each bar opens at its first day's open,
+    closes at its last day's close (and adjusted close) and holds the highest high, lowest
+    low and total volume.
+
+    :param history: History of daily or intraday bars
+    :param interval: Interval of the new bars
+        '1wk' / 'weekly' - calendar weeks starting Monday
+        '1mo' / 'monthly' - calendar months
+        '3mo' / 'quarterly' - calendar quarters
+        '<N>d' - every N trading days, counted from the first day
+    :returns: History of resampled bars - never an IntradayHistory, every interval is a day
+        or longer
+    """
+    starts = period_starts(history.dates, interval)
+    history_class = History if isinstance(history, IntradayHistory) else type(history)
+
+    if not len(starts):
+        return history_class(history.dates[:0], *(getattr(history, name)[:0]
+                                                  for name in History.COLUMNS))
+
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:] - 1
+    ends[-1] = len(history) - 1
+
+    return history_class(history.dates[starts], history.open[starts],
+                         np.maximum.reduceat(history.high, starts),
+                         np.minimum.reduceat(history.low, starts),
+                         history.close[ends], history.adj_close[ends],
+                         np.add.reduceat(history.volume, starts))
+
+def period_starts(dates, interval):
+    """
+    Index of the first day of each period.
+
+    :param dates: Array of date ordinals (oldest first) - repeated for intraday bars
+    :param interval: Interval, see resample()
+    :returns: int64 array of indexes
+    """
+    match = DAYS_REGEX.match(interval)
+    period = PERIODS.get(interval)
+
+    if match:
+        days = int(match.group(1))
+        if not days:
+            raise ValueError('Interval %s has no days' % interval)
+
+        # Number trading days from 0 - intraday bars of a day share its number
+        keys = (np.cumsum(np.diff(dates, prepend=dates[:1] - 1) != 0) - 1) // days
+    elif period is None:
+        raise ValueError('Unknown interval %s' % interval)
+    elif period == 'week':
+        # Ordinal 1 is a Monday
+        keys = (dates - 1) // 7
+    else:
+        keys = (dates - History.EPOCH_ORDINAL).astype('datetime64[D]') \
+                   .astype('datetime64[M]').astype(np.int64)
+        if period == 'quarter':
+            keys //= 3
+
+    if not len(keys):
+        return np.empty(0, dtype=np.int64)
+
+    return np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import re
+
+from bisect import bisect_left
+from datetime import timedelta
+
+log = logging.getLogger(__name__)
+
+class DataSource:
+    """
+    Where stocks get their data from. Stock.source is used by every stock, Yahoo finance
+    (YahooSource) unless it's set to another source.
+
+    Sources hand back data as Yahoo finance formats it, so everything is parsed the same way
+    whichever source it came from:
+
+        history()    - CSV as downloaded from Yahoo finance historical data
+        statistics() - HTML of the Yahoo finance key statistics page
+
+    ahistory() and astatistics() are their coroutine versions, used by Stock.aload(). They
+    run history() and statistics() in a worker thread unless a source overrides them with
+    non-blocking requests.
+    """
+
+    def history(self, ticker, start, end, interval, events='history'):
+        """
+        Get historical data.
+
+        :param ticker: Stocks ticker
+        :param start: datetime of the first day
+        :param end: datetime of the last day
+        :param interval: Interval for data points ('1d', '1wk', '1mo' or intraday '1m', '5m',
+            '15m', '1h')
+        :param events: 'history' for prices, 'div' for dividends or 'split' for splits
+        :returns: CSV string, None if it isn't available.
+        """
+        raise NotImplementedError()
+
+    def statistics(self, ticker):
+        """
+        Get the key statistics page.
+
+        :param ticker: Stocks ticker
+        :returns: HTML string, None if it isn't available.
+        """
+        raise NotImplementedError()
+
+    async def ahistory(self, ticker, start, end, interval, events='history'):
+        """
+        Coroutine version of history().
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.history, ticker, start, end, interval, events)
+
+    async def astatistics(self, ticker):
+        """
+        Coroutine version of statistics().
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.statistics, ticker)
+
+    async def aclose(self):
+        """
+        Release connections held for coroutine requests, if there are any.
+        """
+
+class LocalSource(DataSource):
+    """
+    Data read from CSV files in a directory, such as a vendor's bulk dumps.
+
+    Files must be laid out like Yahoo finance CSV (header first, oldest day first). Which
+    file holds what is given by patterns that can use {ticker}, {interval} and {events}.
+    Requests for a range of days only return those days, found with a binary search.
+    """
+
+    def __init__(self, path, pattern='{ticker}.csv', events_pattern='{ticker}_{events}.csv',
+                 statistics_pattern='{ticker}.html'):
+        """
+        :param path: Directory of the files
+        :param pattern: File name of historical data
+        :param events_pattern: File name of dividends and splits
+        :param statistics_pattern: File name of a saved key statistics page
+        """
+        self.path = path
+        self.pattern = pattern
+        self.events_pattern = events_pattern
+        self.statistics_pattern = statistics_pattern
+
+    def history(self, ticker, start, end, interval, events='history'):
+        pattern = self.pattern if events == 'history' else self.events_pattern
+        raw_csv = self._read(pattern.format(ticker=ticker.upper(), interval=interval,
+                                            events=events))
+        if raw_csv is None:
+            return None
+
+        header, _, body = raw_csv.partition('\n')
+        lines = body.splitlines()
+        if lines and not lines[-1]:
+            lines.pop()
+
+        # Lines start with the date, so they sort by date
+        first = bisect_left(lines, start.strftime('%Y-%m-%d'))
+        last = bisect_left(lines, (end + timedelta(days=1)).strftime('%Y-%m-%d'))
+
+        return '\n'.join([header] + lines[first:last]) + '\n'
+
+    def statistics(self, ticker):
+        return self._read(self.statistics_pattern.format(ticker=ticker.upper()))
+
+    def _read(self, name):
+        """
+        :returns: Contents of a file in the directory, None if there's no such file.
+        """
+        try:
+            with open(os.path.join(self.path, name), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+class ReplaySource(DataSource):
+    """
+    Record data from another source and replay it later, for runs that give the same
+    results every time and need no network.
+
+    Given a source, every response is passed through and saved in the directory. Without
+    one, responses are read back from the directory and requests that weren't recorded
+    get None. Each request is saved to its own file, named after what was requested:
+
+        <TICKER>_<events>_<interval>_<start>_<end>.csv
+        <TICKER>_statistics.html
+
+    Replayed requests have to match the recorded ones exactly, so give stocks explicit start
+    and end dates rather than relying on the default of today.
+    """
+
+    def __init__(self, path, source=None):
+        """
+        :param path: Directory of recordings
+        :param source: Source to record from, None to replay
+        """
+        self.path = path
+        self.source = source
+
+        if source is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @property
+    def recording(self):
+        """
+        True if responses are being recorded rather than replayed.
+        """
+        return self.source is not None
+
+    def history(self, ticker, start, end, interval, events='history'):
+        name = '%s_%s_%s_%s_%s.csv' % (ticker.upper(), events, interval,
+                                       start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))
+
+        if self.recording:
+            return self._record(name, self.source.history(ticker, start, end, interval, events))
+
+        return self._replay(name)
+
+    def statistics(self, ticker):
+        name = '%s_statistics.html' % ticker.upper()
+
+        if self.recording:
+            return self._record(name, self.source.statistics(ticker))
+
+        return self._replay(name)
+
+    def _record(self, name, text):
+        """
+        Save a response. Failed requests aren't saved.
+        """
+        if text is not None:
+            path = os.path.join(self.path, _safe_name(name))
+            tmp_path = '%s.%s.tmp' % (path, os.getpid())
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+        return text
+
+    def _replay(self, name):
+        """
+        Read a saved response back.
+        """
+        try:
+            with open(os.path.join(self.path, _safe_name(name)), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            log.error('No recording of %s', name)
+            return None
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def _safe_name(name):
+    """
+    Replace characters tickers may have (^GSPC, BRK/B) that don't belong in file names.
+    """
+    return re.sub(r'[^\w.=-]', '_', name)
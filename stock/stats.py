@@ -0,0 +1,125 @@
+import re
+
+from html.parser import HTMLParser
+
+# Container of all statistics tables and the class of cells holding a value
+STATS_DIV_CLASS = 'Mstart(a) Mend(a)'
+VALUE_TD_CLASS = 'Fz(s) Fw(500) Ta(end)'
+
+STATS_DIV_REGEX = re.compile(r'<div\b[^>]*\bclass=(["\'])\s*Mstart\(a\)\s+Mend\(a\)\s*\1')
+
+class _Done(Exception):
+    """
+    Raised to stop parsing once the statistics container is closed.
+    """
+
+class StatsParser(HTMLParser):
+    """
+    Streaming extraction of statistics from Yahoo finance's key statistics page.
+
+    Rather than building a tree of the whole page, tags are handled as they're read and only
+    the statistics container is looked at. Each value cell's text is paired with the text of
+    the first span in the cell before it, its label.
+
+    Equivalent to BeautifulSoup's:
+
+        div = soup.find_all('div', STATS_DIV_CLASS)[0]
+        for td in div.find_all('td', VALUE_TD_CLASS):
+            label = td.previous_sibling.find('span').get_text()
+            value = td.get_text()
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+
+        self.stats = []
+
+        self._div_depth = 0     # Depth of divs within the container, 0 outside of it
+        self._td_text = None    # Text of the cell being read
+        self._td_value = False  # Cell being read holds a value
+        self._td_label = None   # Label of the cell being read
+        self._span_text = None  # Text of the first span in the cell being read
+        self._span_depth = 0    # Depth of spans while reading the first span
+        self._prev_label = None # Label of the previous cell in the row
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            if self._div_depth:
+                self._div_depth += 1
+            elif _has_class(attrs, STATS_DIV_CLASS):
+                self._div_depth = 1
+            return
+
+        if not self._div_depth:
+            return
+
+        if tag == 'tr':
+            self._prev_label = None
+        elif tag == 'td':
+            self._td_text = []
+            self._td_value = _has_class(attrs, VALUE_TD_CLASS)
+            self._td_label = None
+            self._span_text = None
+        elif tag == 'span' and self._td_text is not None:
+            if self._span_depth:
+                self._span_depth += 1
+            elif self._td_label is None and self._span_text is None:
+                self._span_text = []
+                self._span_depth = 1
+
+    def handle_endtag(self, tag):
+        if not self._div_depth:
+            return
+
+        if tag == 'div':
+            self._div_depth -= 1
+            if not self._div_depth:
+                raise _Done()
+        elif tag == 'span' and self._span_depth:
+            self._span_depth -= 1
+            if not self._span_depth:
+                self._td_label = ''.join(self._span_text)
+        elif tag == 'td' and self._td_text is not None:
+            if self._td_value and self._prev_label is not None:
+                self.stats.append((self._prev_label, ''.join(self._td_text)))
+
+            self._prev_label = self._td_label
+            self._td_text = None
+
+    def handle_data(self, data):
+        if self._td_text is not None:
+            self._td_text.append(data)
+            if self._span_depth:
+                self._span_text.append(data)
+
+def extract_statistics(html):
+    """
+    Extract the raw statistics from the key statistics page.
+
+    :param html: Page HTML
+    :returns: List of (label, value text) pairs in page order, None if there are no
+        statistics on the page.
+    """
+    match = STATS_DIV_REGEX.search(html)
+    if not match:
+        return None
+
+    # Skip everything before the statistics
+    parser = StatsParser()
+    try:
+        parser.feed(html[match.start():])
+        parser.close()
+    except _Done:
+        pass
+
+    return parser.stats
+
+def _has_class(attrs, cls):
+    """
+    Check if a tag's class attribute is cls - whitespace between classes is ignored.
+    """
+    for name, value in attrs:
+        if name == 'class':
+            return value is not None and ' '.join(value.split()) == cls
+
+    return False
@@ -1,14 +1,49 @@
+import asyncio
+import json
+import logging
 import re
+import threading
 import time
 import requests
 
-from bs4 import BeautifulSoup
-from datetime import datetime
-
-CRUMB_REGEX = '.*"CrumbStore":\{"crumb":"(?P<crumb>[^"]+)"\}'
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from datetime import date as date_type, datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from . import arrow
+from .auth import CrumbManager
+from .cache import CSV_HEADER
+from .events import Events, adjust
+from .history import CompactHistory, History, IntradayHistory, np
+from .indicators import Indicators
+from .instrument import Instruments
+from .resample import resample
+from .sources import DataSource
+from .stats import extract_statistics
+
+CRUMB_REGEX = r'.*"CrumbStore":\{"crumb":"(?P<crumb>[^"]+)"\}'
+DATE_REGEX = re.compile(r'(\d{4})(?P<seperator>[./-])(\d{1,2})(?P=seperator)(\d{1,2})')
+TIME_REGEX = re.compile(r'[ T](\d{1,2}):(\d{2})(?::(\d{2}))?')
+STAT_DATE_REGEX = re.compile(r'^([\w]+)\s(\d{1,2})[,]\s(\d{4})')
+STAT_PERCENT_REGEX = re.compile(r'^([\d]+[.][\d]{2})[%]')
+STAT_NUMBER_REGEX = re.compile(r'^([\d]+[.][\d]{2})([M|B|T])*')
 REQUEST_URL = "https://query1.finance.yahoo.com/v7/finance/download/%s" \
               "?period1=%s&period2=%s&interval=%s&events=%s&crumb=%s"
 STATS_URL = "https://finance.yahoo.com/quote/%s/key-statistics?p=%s"
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/%s" \
+            "?period1=%s&period2=%s&interval=%s&events=%s&crumb=%s"
+COOKIE_URL = "https://finance.yahoo.com/quote/SPY/history"
+
+log = logging.getLogger(__name__)
 
 class Stock:
     """
@@ -18,8 +53,30 @@ class Stock:
     #--------------------------------------------------------------------------
     # Class attributes
     #----
-    _YAHOO_COOKIE = None
-    _YAHOO_CRUMB = None
+    # Shared by all stocks and created on first use - see crumb_manager() and _get_session()
+    _CRUMB_MANAGER = None
+    _SESSION = None
+    _SHARED_LOCK = threading.Lock()
+
+    POOL_SIZE = 32
+
+    # Intraday intervals, and the most days Yahoo returns bars of them for in one request.
+    # Longer ranges are downloaded in chunks.
+    INTRADAY_CHUNK_DAYS = {
+        '1m' : 7,
+        '5m' : 60,
+        '15m' : 60,
+        '1h' : 730,
+    }
+
+    # HistoryCache shared by all stocks, None to always download the full range
+    history_cache = None
+
+    # DataSource shared by all stocks - Yahoo finance if None, see data_source()
+    source = None
+
+    # Timing of fetching, parsing, indexing and lookups - set enabled to record
+    instruments = Instruments()
 
     # Yahoo Finance historical data
     OPEN_IDX = 0
@@ -29,9 +86,25 @@ class Stock:
     ADJ_CLOSE_IDX = 4
     VOLUME_IDX = 5
 
-    FIRST_DAY_KEY = 'first_day'
+    # Attributes a lazy stock loads on first access, and the function loading them
+    _LAZY_LOADERS = {
+        'stock' : '_load_history',
+        'stock_index' : '_load_history',
+        'indicators' : '_load_history',
+        'stats' : '_load_statistics',
+        'events' : '_load_events',
+    }
+
+    # Runs background loads for prefetch() - created on first use
+    _EXECUTOR = None
+
+    # Threads parsing for aload() - created on first use. Parsing holds the GIL, so every
+    # extra thread makes the event loop wait longer for its turn.
+    PARSE_WORKERS = 1
+    _PARSE_EXECUTOR = None
 
-    def __init__(self, ticker, start=None, end=None, interval='1d', advanced=False):
+    def __init__(self, ticker, start=None, end=None, interval='1d', advanced=False,
+                 columnar=False, lazy=False, events=False, compact=False):
         """
         :param ticker: Stocks ticker
         :param start: Start date for historical data
@@ -40,6 +113,8 @@ class Stock:
             '1d' - daily
             '1wk' - weekly
             '1mo' - monthly
+            '1m', '5m', '15m', '1h' - intraday, see IntradayHistory. Intraday bars are always
+                stored in NumPy columns and looked up by time.
         :param advanced: 
             Flag to indicate if the stock should have an advanced structure built.
             The advanced structure improves efficiency for more demanding calculations by buidling
@@ -47,24 +122,553 @@ class Stock:
 
             If you're planning on doing many calculations on a stock, using the advanced flag is
             recommended. More details on the data structure can be found below.
+        :param columnar:
+            Flag to store historical data in contiguous NumPy columns (see History) instead of
+            a list of days. Uses a fraction of the memory and is much faster to scan, at the
+            cost of requiring NumPy. All accessors behave the same either way.
+        :param lazy:
+            Flag to defer requests until the data is used. Historical data is requested the
+            first time stock/stock_index (or any price accessor) is used, and statistics the
+            first time stats (or any statistics accessor) is used. See also prefetch().
+        :param events:
+            Flag to request dividends and splits for the same range as historical data, see
+            adjusted(). Lazy stocks request them the first time events is used.
+        :param compact:
+            Flag to store historical data as fixed point integers (see CompactHistory), about
+            half the memory of columnar data. Implies columnar. Prices are converted back to
+            floats when they're read.
         """
 
         self.ticker = ticker = ticker.upper()
         self.advanced = advanced
-        self.stock_index = {}
+        self._init_storage(interval, columnar, compact)
+
+        if lazy:
+            # Loaded by __getattr__ on first access
+            self._lazy = (start, end, interval, events)
+            self._history_lock = threading.Lock()
+            self._stats_lock = threading.Lock()
+            self._events_lock = threading.Lock()
+            return
+
+        self.stock_index = array('i')
         self.stock = self._get_stock(ticker, start, end, interval, advanced)
-        self.stats = {}
-        self._request_statistics(ticker)
-
-        if __debug__:
-            print("Created {}.\n\n".format(self.ticker))
-            #print(self.stock)
-            #print(self.stock_index)
-            #print(self.stats)
+        self.stats = self._request_statistics(ticker)
+        self.events = self._request_events(ticker, start, end) if events else None
+
+        log.debug('Created %s', self.ticker)
+
+    @classmethod
+    def from_csv(cls, ticker, raw_csv, advanced=False, columnar=False, compact=False,
+                 interval='1d'):
+        """
+        Build a stock from Yahoo finance CSV that has already been downloaded. No requests are
+        made, so statistics are left empty.
+
+        :param ticker: Stocks ticker
+        :param raw_csv: string CSV as returned from yahoo finance
+        :param advanced: Flag to indicate if the stock should have an advanced structure built.
+        :param columnar: Flag to store historical data in NumPy columns.
+        :param compact: Flag to store historical data as fixed point integers.
+        :param interval: Interval of the data points in raw_csv
+        :returns: Stock instance
+        """
+        stock = cls.__new__(cls)
+        stock.ticker = ticker.upper()
+        stock.advanced = advanced
+        stock._init_storage(interval, columnar, compact)
+        stock.stock_index = array('i')
+        stock.stock = stock._parse_stock_csv(raw_csv, advanced)
+        stock.stats = {}
+        stock.events = None
+
+        return stock
+
+    @classmethod
+    def load_many(cls, tickers, start=None, end=None, interval='1d', advanced=False,
+                  columnar=False, max_workers=8, compact=False):
+        """
+        Load many stocks concurrently over the shared connection pool.
+
+        A ticker that fails to load doesn't stop the others, its error is reported instead.
+
+        :param tickers: Iterable of stock tickers
+        :param start: Start date for historical data
+        :param end: End date for historical data
+        :param interval: Interval for data points
+        :param advanced: Flag to indicate if the stocks should have an advanced structure built.
+        :param columnar: Flag to store historical data in NumPy columns.
+        :param max_workers: Number of stocks loaded at once
+        :param compact: Flag to store historical data as fixed point integers.
+        :returns: Tuple of dictionaries ({ticker : Stock}, {ticker : exception}), in the order
+            tickers were given.
+        """
+        tickers = [ticker.upper() for ticker in tickers]
+
+        def load(ticker):
+            stock = cls(ticker, start, end, interval, advanced, columnar, compact=compact)
+            if stock.stock is None:
+                raise IOError('Could not retrieve stock %s' % ticker)
+            return stock
+
+        stocks = {}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(ticker, executor.submit(load, ticker)) for ticker in tickers]
+
+            for ticker, future in futures:
+                try:
+                    stocks[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = e
+
+        return stocks, errors
+
+    @classmethod
+    async def aload(cls, ticker, start=None, end=None, interval='1d', advanced=False,
+                    columnar=False, events=False, compact=False):
+        """
+        Coroutine building a stock like Stock(...), without blocking the event loop.
+
+        Historical data, statistics and events are requested at the same time through the
+        coroutine functions of the data source (see DataSource.ahistory()), and parsing and
+        indexing run in a worker thread.
+
+        :param ticker: Stocks ticker
+        :param start: Start date for historical data
+        :param end: End date for historical data
+        :param interval: Interval for data points
+        :param advanced: Flag to indicate if the stock should have an advanced structure built.
+        :param columnar: Flag to store historical data in NumPy columns.
+        :param events: Flag to request dividends and splits.
+        :param compact: Flag to store historical data as fixed point integers.
+        :returns: Stock instance
+        """
+        stock = cls.__new__(cls)
+        stock.ticker = ticker = ticker.upper()
+        stock.advanced = advanced
+        stock._init_storage(interval, columnar, compact)
+        stock.stock_index = array('i')
+
+        pending = [stock._aget_stock(ticker, start, end, interval, advanced),
+                   stock._arequest_statistics(ticker)]
+        if events:
+            pending.append(stock._arequest_events(ticker, start, end))
+
+        results = await asyncio.gather(*pending)
+
+        stock.stock, stock.stats = results[:2]
+        stock.events = results[2] if events else None
+
+        log.debug('Created %s', ticker)
+
+        return stock
+
+    @classmethod
+    async def aload_many(cls, tickers, start=None, end=None, interval='1d', advanced=False,
+                         columnar=False, concurrency=8, compact=False, events=False):
+        """
+        Coroutine version of load_many(), loading stocks with aload().
+
+        A ticker that fails to load doesn't stop the others, its error is reported instead.
+
+        :param tickers: Iterable of stock tickers
+        :param start: Start date for historical data
+        :param end: End date for historical data
+        :param interval: Interval for data points
+        :param advanced: Flag to indicate if the stocks should have an advanced structure built.
+        :param columnar: Flag to store historical data in NumPy columns.
+        :param concurrency: Number of stocks loaded at once
+        :param compact: Flag to store historical data as fixed point integers.
+        :param events: Flag to request dividends and splits.
+        :returns: Tuple of dictionaries ({ticker : Stock}, {ticker : exception}), in the order
+            tickers were given.
+        """
+        tickers = [ticker.upper() for ticker in tickers]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(ticker):
+            async with semaphore:
+                stock = await cls.aload(ticker, start, end, interval, advanced, columnar,
+                                        events, compact)
+            if stock.stock is None:
+                raise IOError('Could not retrieve stock %s' % ticker)
+            return stock
+
+        results = await asyncio.gather(*(load(ticker) for ticker in tickers),
+                                       return_exceptions=True)
+
+        stocks = {}
+        errors = {}
+
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, BaseException):
+                errors[ticker] = result
+            else:
+                stocks[ticker] = result
+
+        return stocks, errors
+
+    @classmethod
+    def from_history(cls, ticker, history, advanced=False, interval='1d'):
+        """
+        Build a columnar stock around existing History columns. The columns are used as is,
+        so a History viewing shared memory (see Universe) is never copied. No requests are
+        made, so statistics are left empty.
+
+        :param ticker: Stocks ticker
+        :param history: History instance
+        :param advanced: Flag to indicate if the stock should have an advanced structure built.
+        :param interval: Interval of the bars in history, used by update()
+        :returns: Stock instance
+        """
+        stock = cls.__new__(cls)
+        stock.ticker = ticker.upper()
+        stock.advanced = advanced
+        stock.columnar = True
+        stock.compact = isinstance(history, CompactHistory)
+        stock.intraday = isinstance(history, IntradayHistory)
+        stock.interval = interval
+        stock.base_interval = None
+        stock.stock_index = array('i')
+        stock._index_stock_data(history)
+        stock.stock = stock._advanced_index(history) if advanced else history
+        stock.stats = {}
+        stock.events = None
+
+        return stock
+
+    @classmethod
+    def from_parquet(cls, path, tickers=None, advanced=False, compact=False, interval=None):
+        """
+        Build stocks from a Parquet dataset partitioned by ticker, as written by
+        stock.arrow.write_dataset(). Columns are read straight into History arrays and no
+        requests are made, so statistics are left empty.
+
+        :param path: Directory of the dataset
+        :param tickers: Tickers to load, defaults to every ticker in the dataset
+        :param advanced: Flag to indicate if the stocks should have an advanced structure built.
+        :param compact: Flag to store historical data as fixed point integers.
+        :param interval: Interval of the bars in the dataset, used by update(). Defaults to
+            the interval the dataset was written with. Datasets without one are taken to
+            hold daily bars, intraday bars need the interval given.
+        :returns: Dictionary of ticker to Stock. Tickers that aren't in the dataset are left
+            out.
+        """
+        histories = arrow.read_dataset(path, tickers, compact)
+        intervals = arrow.read_intervals(path, list(histories)) if interval is None else {}
+
+        stocks = {}
+        for ticker, history in histories.items():
+            stock_interval = interval or intervals.get(ticker)
+            if stock_interval is None:
+                if isinstance(history, IntradayHistory):
+                    raise ValueError('%s holds intraday bars without an interval, pass '
+                                     'interval' % ticker)
+                stock_interval = '1d'
+
+            stocks[ticker] = cls.from_history(ticker, history, advanced, stock_interval)
+
+        return stocks
             
+    def __getattr__(self, name):
+        """
+        Only called for attributes that aren't set - loads deferred data of lazy stocks.
+        """
+        loader = Stock._LAZY_LOADERS.get(name)
+        if loader is None or '_lazy' not in self.__dict__:
+            raise AttributeError("'Stock' object has no attribute '%s'" % name)
+
+        getattr(self, loader)()
+
+        # Only advanced stocks have indicators
+        if name not in self.__dict__:
+            raise AttributeError("'Stock' object has no attribute '%s'" % name)
+
+        return self.__dict__[name]
+
     #--------------------------------------------------------------------------
     # Public functions
     #----
+
+    def prefetch(self, history=True, stats=True):
+        """
+        Start loading deferred data of a lazy stock in the background. Accessing the data
+        waits for the load to finish. Does nothing for data that's already loaded.
+
+        :param history: Flag to load historical data
+        :param stats: Flag to load statistics
+        """
+        if '_lazy' not in self.__dict__:
+            return
+
+        with Stock._SHARED_LOCK:
+            if Stock._EXECUTOR is None:
+                Stock._EXECUTOR = ThreadPoolExecutor(max_workers=Stock.POOL_SIZE)
+
+        if history and 'stock' not in self.__dict__:
+            Stock._EXECUTOR.submit(self._load_history)
+            if self._lazy[3] and 'events' not in self.__dict__:
+                Stock._EXECUTOR.submit(self._load_events)
+        if stats and 'stats' not in self.__dict__:
+            Stock._EXECUTOR.submit(self._load_statistics)
+
+    def append_bars(self, bars):
+        """
+        Append new days to the end of the historical data, in place.
+
+        The date index is extended rather than rebuilt and indicators of advanced stocks are
+        only computed for the new days, so keeping a stock up to date costs the same no matter
+        how much history it holds.
+
+        Days before the last day already held are ignored. A day on the last day replaces it,
+        as it may have been downloaded before the market closed.
+
+        :param bars: New days (oldest first) - CSV as returned from yahoo finance, a History,
+            or a list of days as held by list based stocks.
+        :returns: Number of days added, not counting a replaced last day.
+        """
+        length = len(self.stock)
+
+        if isinstance(bars, str):
+            if self.columnar:
+                bars = type(self.stock).from_csv(bars)
+            else:
+                bars = [self._parse_day_str(data) for data in bars.split('\n')[1:]
+                        if data and 'null' not in data]
+
+        if self.columnar:
+            if not isinstance(bars, History):
+                bars = type(self.stock).from_rows(bars)
+
+            start = self.stock.append(bars)
+            if start is None:
+                return 0
+
+            # Columns may have moved to a bigger buffer
+            self.stock_index = memoryview(self.stock.keys)
+        else:
+            if isinstance(bars, History):
+                bars = bars.rows()
+
+            start = self._append_days(bars)
+            if start is None:
+                return 0
+
+            if self.advanced:
+                self.indicators.history.append(History.from_rows(self.stock[start:]))
+
+        if self.advanced:
+            self.indicators.update(start)
+
+        if self.__dict__.get('_adjusted'):
+            # Days from start on aren't adjusted yet
+            self._adjusted[2] = min(self._adjusted[2], start)
+
+        for cached in self.__dict__.get('_resampled', {}).values():
+            # Days from start on aren't resampled yet
+            cached[1] = min(cached[1], start)
+
+        return len(self.stock) - length
+
+    def update(self, end=None):
+        """
+        Request days since the last day held and append them (see append_bars). The last day
+        is requested again, in case it was downloaded before the market closed.
+
+        Stocks built by resample() have intervals Yahoo may not have ('5d', 'quarterly'),
+        or bars that differ from Yahoo's. Their bars are requested at base_interval from the
+        first day of the last bar and resampled.
+
+        Dividends and splits are requested for the same days if the stock has events.
+
+        :param end: End date for historical data, defaults to now.
+        :returns: Number of days added, None if the request failed.
+        """
+        if not len(self.stock):
+            return None
+
+        start = self._key_datetime(self.stock_index[-1])
+        end = end or datetime.now()
+        csv = self._fetch_csv(self.ticker, start, end, self.base_interval or self.interval)
+
+        if not csv:
+            log.error('Could not update %s', self.ticker)
+            return None
+
+        if self.events is not None:
+            self.request_events(start, end)
+
+        if self.base_interval:
+            history_class = IntradayHistory if self.base_interval in Stock.INTRADAY_CHUNK_DAYS \
+                            else History
+            csv = resample(history_class.from_csv(csv), self.interval)
+
+        return self.append_bars(csv)
+
+    def request_events(self, start=None, end=None):
+        """
+        Request dividends and splits and add any that aren't known yet to events.
+
+        :param start: Start date, defaults to the first day held
+        :param end: End date, defaults to now
+        :returns: True if new events arrived
+        """
+        if start is None:
+            start = self._key_datetime(self.stock_index[0]) if len(self.stock) \
+                    else datetime(1970, 1, 1)
+        end = end or datetime.now()
+
+        events = self._request_events(self.ticker, start, end)
+
+        if self.events is None:
+            self.events = events
+            return len(events) > 0
+
+        return self.events.merge(events)
+
+    def adjusted(self):
+        """
+        Historical data adjusted for dividends and splits, calculated from the prices and
+        events rather than trusting Yahoo's adj_close:
+
+            open, high, low, close - split adjusted prices (as Yahoo gives them)
+            volume                 - split adjusted volume (as Yahoo gives it)
+            adj_close              - split and dividend adjusted close (total return)
+
+        The adjustment is calculated in one vectorized pass and kept. It's only calculated
+        again when new events arrive - days appended after the last event are adjusted on
+        their own. Events are requested first if the stock doesn't have any.
+
+        :returns: History instance
+        """
+        if self.events is None:
+            self.request_events()
+
+        events = self.events
+
+        # [events generation, adjusted history, number of days still valid]
+        cached = self.__dict__.get('_adjusted')
+
+        if cached and cached[0] == events.generation and len(cached[1]):
+            _, adjusted, valid = cached
+
+            # Checked before getting history, which converts list based stocks day by day
+            if valid == len(self.stock) == len(adjusted):
+                return adjusted
+
+            history = self.history
+            last_event = events.last_date()
+
+            if valid and (last_event is None or last_event <= adjusted.dates[-1]):
+                # No events on or after the new days - nothing to adjust them for
+                new = history[valid:]
+                adjusted.append(adjust(new, np.ones(len(new))))
+                self._adjusted = [events.generation, adjusted, len(history)]
+                return adjusted
+        else:
+            history = self.history
+
+        dividend_factors = events.dividend_factors(history.dates, history.close)
+
+        adjusted = adjust(history, dividend_factors)
+        self._adjusted = [events.generation, adjusted, len(history)]
+
+        return adjusted
+
+    def resample(self, interval):
+        """
+        Derive a stock with longer bars from this stock's daily (or intraday) bars, without
+        requesting anything. Every interval comes from the same days, so they always agree.
+
+        Resampled stocks are kept per interval. When days are appended to this stock, only
+        the last bar and the bars after it are calculated again.
+
+        :param interval: Interval of the new bars
+            '1wk' / 'weekly' - calendar weeks starting Monday
+            '1mo' / 'monthly' - calendar months
+            '3mo' / 'quarterly' - calendar quarters
+            '<N>d' - every N trading days, counted from the first day
+        :returns: Columnar Stock with one bar per period, dated by its first trading day.
+            Bars resampled from intraday bars are daily or longer, so the stock isn't intraday.
+            Its base_interval is this stock's interval, which its update() requests.
+        """
+        if '_resampled' not in self.__dict__:
+            # Interval to [resampled stock, number of days still valid]
+            self._resampled = {}
+
+        cached = self._resampled.get(interval)
+
+        # Checked before getting history, which converts list based stocks day by day
+        if cached is not None and cached[1] == len(self.stock):
+            return cached[0]
+
+        history = self.history
+
+        if cached is None:
+            stock = Stock.from_history(self.ticker, resample(history, interval), self.advanced,
+                                       interval)
+            stock.base_interval = self.base_interval or self.interval
+            self._resampled[interval] = [stock, len(history)]
+            return stock
+
+        stock, valid = cached
+        if valid < len(history):
+            # Start over from the first day of the last bar, it may not be complete
+            start = int(np.searchsorted(history.dates, stock.stock_index[-1])) \
+                    if len(stock.stock) else 0
+            stock.append_bars(resample(history[start:], interval))
+            cached[1] = len(history)
+
+        return stock
+
+    @property
+    def history(self):
+        """
+        Historical data as History columns. List based stocks are converted on every access.
+        """
+        if isinstance(self.stock, History):
+            return self.stock
+
+        return History.from_rows(self.stock)
+
+    def to_arrow(self):
+        """
+        Historical data as an Arrow table (date, open, high, low, close, adj_close, volume).
+        Columns are converted as whole arrays - the price and volume columns of columnar
+        stocks are shared with Arrow, not copied. Requires PyArrow.
+
+        :returns: pyarrow.Table
+        """
+        return arrow.to_table(self.history)
+
+    def to_record_batch(self):
+        """
+        Historical data as an Arrow record batch, see to_arrow().
+
+        :returns: pyarrow.RecordBatch
+        """
+        return arrow.to_record_batch(self.history)
+
+    def to_pandas(self):
+        """
+        Historical data as a pandas DataFrame indexed by date (time for intraday stocks),
+        converted through Arrow rather than day by day. Requires PyArrow and pandas.
+
+        :returns: pandas.DataFrame
+        """
+        frame = self.to_arrow().to_pandas(date_as_object=False)
+        return frame.set_index('time' if self.intraday else 'date')
+
+    def to_parquet(self, path):
+        """
+        Write historical data to a Parquet file. To save many stocks for
+        Stock.from_parquet(), use stock.arrow.write_dataset().
+
+        :param path: Path of the file
+        """
+        arrow.write_parquet(path, self.history)
     
     def day_info(self, date=None, end_date=None):
         """
@@ -72,9 +676,18 @@ class Stock:
         
         If date is outside of available range, None is returned.
         If date is a holiday or weekend, the nearest preceding day is returned.
+
+        Ranges are half open: they start at the day that a single lookup of date resolves to
+        and include every day strictly before end_date. The same rule applies to all range
+        accessors (open, close, ...).
+
+        Many dates can be looked up at once by passing a sequence or array of dates (see
+        date_ordinals) - they're all resolved in one vectorized search, with the same rules as
+        a single date. Every accessor (open, close, ...) then returns an array aligned with
+        the dates, and day_info a History (columnar) or list of days.
         
-        :param date: Date for which to get data for - start range.
-        :param end_date: Date for which to get a range for.
+        :param date: Date for which to get data for - start range. Or a sequence of dates.
+        :param end_date: Date for which to get a range for (exclusive).
         :returns: Tuple of available day data.
         """
         return self._day_info(date, end_date)
@@ -196,18 +809,77 @@ class Stock:
     #--------------------------------------------------------------------------
     # Static functions
     #----
+
+    @staticmethod
+    def data_source():
+        """
+        Get the DataSource all stocks request data from. Stock.source if it's set, a
+        YahooSource created on first use otherwise.
+        """
+        with Stock._SHARED_LOCK:
+            if Stock.source is None:
+                Stock.source = YahooSource()
+
+        return Stock.source
+
+    @staticmethod
+    def crumb_manager():
+        """
+        Get the CrumbManager shared by all stocks, creating it on first use.
+
+        Its counters show how often the Yahoo cookie/crumb was refreshed and requests retried.
+        """
+        with Stock._SHARED_LOCK:
+            if Stock._CRUMB_MANAGER is None:
+                Stock._CRUMB_MANAGER = CrumbManager(Stock._get_cookie_crumb)
+
+        return Stock._CRUMB_MANAGER
+
+    @staticmethod
+    def _get_session():
+        """
+        Get the requests.Session shared by all stocks, creating it on first use.
+
+        The session keeps up to POOL_SIZE connections per host alive, so loading many stocks
+        doesn't pay for a new TLS handshake on every request.
+        """
+        with Stock._SHARED_LOCK:
+            if Stock._SESSION is None:
+                adapter = HTTPAdapter(pool_connections=Stock.POOL_SIZE,
+                                      pool_maxsize=Stock.POOL_SIZE)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                Stock._SESSION = session
+
+        return Stock._SESSION
+
+    @staticmethod
+    def _parse_executor():
+        """
+        Get the thread pool aload() parses in, creating it on first use.
+        """
+        with Stock._SHARED_LOCK:
+            if Stock._PARSE_EXECUTOR is None:
+                Stock._PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=Stock.PARSE_WORKERS)
+
+        return Stock._PARSE_EXECUTOR
     
     @staticmethod
     def _get_cookie_crumb():
         """
         Retrieve a valid cookie and crumb for Yahoo finance.
 
-        This is required to download historical data properly via https request.
+        This is required to download historical data properly via https request. Use
+        crumb_manager() rather than calling this directly.
+
+        :returns: Tuple of (cookie, crumb)
         """
+        crumb = None
 
-        response = requests.get('https://finance.yahoo.com/quote/SPY/history')
+        response = Stock._get_session().get(COOKIE_URL)
 
-        Stock._YAHOO_COOKIE = response.cookies['B']
+        cookie = response.cookies['B']
 
         pattern = re.compile(CRUMB_REGEX)
 
@@ -215,20 +887,31 @@ class Stock:
             match = pattern.match(line)
             if match:
                 # Protect against unicode characters in crumb (different between 2.x and 3+)
-                Stock._YAHOO_CRUMB = \
-                    bytes(match.groupdict()['crumb'], encoding='ascii').decode('unicode_escape')
+                crumb = bytes(match.groupdict()['crumb'], encoding='ascii').decode('unicode_escape')
+
+        if crumb is None:
+            raise IOError('Could not find Yahoo finance crumb')
 
-        if __debug__:
-            print('\n ======================================')
-            print('| Cookie: ' + Stock._YAHOO_COOKIE)
-            print('| Crumb: ' + Stock._YAHOO_CRUMB)
-            print(' ======================================\n')
+        log.debug('Cookie: %s Crumb: %s', cookie, crumb)
+
+        return cookie, crumb
 
     #--------------------------------------------------------------------------
     # Private functions
     #----
     
     def _day_info(self, date=None, end_date=None):
+        """
+        Look up a day or range of days (see _lookup), timed as a lookup when instruments are
+        enabled.
+        """
+        if Stock.instruments.enabled:
+            with Stock.instruments.time('lookup', ticker=self.ticker):
+                return self._lookup(date, end_date)
+
+        return self._lookup(date, end_date)
+
+    def _lookup(self, date=None, end_date=None):
         """
         Return all information for a particular date. A day is comprised of a date, yahoo data,
         and any additional data saved off in the following format:
@@ -236,29 +919,39 @@ class Stock:
         [date, (yahoo_data), [<additional data>]]
 
         :param date: Date for which to retrieve data for
-        :param end_date: End date for a range of date (preceding date)
-        :returns: Daily data (oldest first)
+        :param end_date: End date for a range of date (exclusive)
+        :returns: Daily data (oldest first). Ranges are a slice of the stock data - a History
+            view for columnar data.
         """
 
+        if is_date_batch(date):
+            if end_date:
+                raise ValueError('Ranges can only be looked up for a single date')
+
+            indexes = self._get_date_indexes(date)
+
+            if isinstance(self.stock, History):
+                return self.stock[indexes]
+            return [self.stock[i] for i in indexes.tolist()]
+
         # Parse date range into indicies
         if date is None:
-            date = datetime.today() # default
+            date = datetime.now(timezone.utc) if self.intraday else datetime.today() # default
         elif not isinstance(date, datetime):
             date = parse_date(date)
 
         start_idx = self._get_date_index(date)
 
-        if __debug__:
-            print('Starting date : %s at index %s' % (date, start_idx))
+        log.debug('Starting date %s at index %s', date, start_idx)
 
         if end_date:
             if not isinstance(end_date, datetime):
                 end_date = parse_date(end_date)
 
-            end_idx = self._get_date_index(end_date)
+            # First day on or after end_date - it's excluded from the range
+            end_idx = bisect_left(self.stock_index, self._date_key(end_date))
 
-            if __debug__:
-                print('Ending date %s at index %s' % (end_date, end_idx))
+            log.debug('Ending date %s at index %s', end_date, end_idx)
 
             if start_idx > end_idx:
                 return None # Or raise an error for dates? TODO:
@@ -271,107 +964,195 @@ class Stock:
         """
         Return a piece of day_info from yahoo historical data.
 
+        Ranges of columnar data are returned as a NumPy view on the column, no data is copied.
+
         :param idx: Index of data piece
         :param date: Start date
-        :param end_date: End date for range
+        :param end_date: End date for range (exclusive)
         :returns: Data or range of date for a particular piece.
         """
-        open_data = []
         day_info = self._day_info(date, end_date)
 
+        if is_date_batch(date):
+            if isinstance(day_info, History):
+                return day_info.column(idx)
+            return np.array([data[1][idx] for data in day_info])
+
         # Single days aren't lists
         if not end_date:
             return day_info[1][idx]
 
-        # Extract the data
-        for data in day_info:
-            print(data)
-            open_data.append(data[1][idx])
+        if day_info is None:
+            return None
 
-        return open_data
+        if isinstance(day_info, History):
+            return day_info.column(idx)
+
+        return [data[1][idx] for data in day_info]
 
     def _get_date_index(self, date):
         """
         Get index of data for the corresponding date. If the date is outside of the range,
-        return the closest date possible.
-        
+        return the closest date possible. Holidays and weekends resolve to the nearest
+        preceding trading day.
+
+        Binary search over the sorted keys in stock_index - O(log n).
+
         :param date: datetime instance
         :returns: index for data
         """
-        max_index = len(self.stock)-1
+        idx = bisect_right(self.stock_index, self._date_key(date)) - 1
 
-        try:
-            curr_index = self.stock_index[date.year][date.month][Stock.FIRST_DAY_KEY]
-        except KeyError:
-            # Non-indexed year/month - out of range.
-            return 0 if self._compare_dates(self.stock[0][0], date) < 0 else max_index
+        # Dates before the first trading day clamp to the first day
+        return idx if idx > 0 else 0
 
-        # Loop over to find exact date
-        done = False
+    def _get_date_indexes(self, dates):
+        """
+        Get indexes of data for many dates at once - _get_date_index vectorized, with a
+        single sorted search over stock_index.
 
-        while not done:
-            curr_date = self.stock[curr_index][0]
-            
-            if __debug__:
-                print('\t%s at index: %s' % (curr_date, curr_index))
-
-            # Check exact date
-            ret = self._compare_dates(curr_date, date)
-            if ret > 0: # Keep looking forward
-                if curr_index < max_index:
-                    curr_index += 1
-                else:
-                    return curr_index
-            elif ret < 0: # Date is in the past
-                return (curr_index - 1) if curr_index > 0 else curr_index
-            else: # Exact match
-                return curr_index
-
-
-    def _compare_dates(self, date_1, date_2):
-        """
-        Compare two dates and return the difference as whether date 1 is before, after, or equal
-        to the compared date.
-        
-        :param date_1: Date 1
-        :param date_2: Date 2
-        :returns: 0 if dates match, 1 if Date 2 follows Date 1, -1 otherwise.
+        :param dates: Sequence or array of dates (see date_ordinals and date_timestamps)
+        :returns: int64 array of indexes aligned with dates
         """
-        year_delta = date_2.year - date_1.year
-        month_delta = date_2.month - date_1.month
-        day_delta = date_2.day - date_1.day
+        if np is None:
+            raise ImportError('NumPy is required to look up many dates at once')
 
-        if year_delta != 0:
-            return -1 if year_delta < 0 else 1
+        keys = date_timestamps(dates) if self.intraday else date_ordinals(dates)
+        idx = np.searchsorted(np.asarray(self.stock_index), keys, side='right') - 1
 
-        if month_delta != 0:
-            return -1 if month_delta < 0 else 1
+        # Dates before the first trading day clamp to the first day
+        return np.maximum(idx, 0)
 
-        return 1 if day_delta > 0 else (0 if day_delta == 0 else -1)
+    def _date_key(self, date):
+        """
+        Key of a datetime in stock_index - a Unix timestamp for intraday stocks (naive
+        datetimes are UTC), the date ordinal otherwise.
+        """
+        return IntradayHistory.to_key(date) if self.intraday else date.toordinal()
+
+    def _key_datetime(self, key):
+        """
+        datetime of a key in stock_index, the reverse of _date_key().
+        """
+        return IntradayHistory.to_datetime(key) if self.intraday else datetime.fromordinal(key)
 
     def _request_statistics(self, ticker):
         """
         Request and parse out the statistic page of yahoo finance for a stock.
         
-        This data is then saved off in a dictionary on the object.
-        TODO: Error checking and such?
+        :param ticker: Stocks ticker
+        :returns: Dictionary of statistics by their label on the website
         """
-        request_url = STATS_URL % (ticker, ticker)
+        with Stock.instruments.time('fetch', ticker=ticker, events='statistics'):
+            html = Stock.data_source().statistics(ticker)
 
-        response = requests.get(request_url)
+        if html is None:
+            log.error('Could not retrieve statistics of %s', ticker)
+            return {}
 
-        parsed_resp = BeautifulSoup(response.text, 'html.parser')
-        # Ugly, but it works here
-        stats_values = parsed_resp.find_all('div', 'Mstart(a) Mend(a)')[0].find_all('td', 'Fz(s) Fw(500) Ta(end)')
+        return self._parse_statistics(html)
 
-        # Iterate all statistic data pieces
-        for values in stats_values:
-            val = values.get_text()
-            val = self._parse_stat(val)
-            label = values.previous_sibling.find('span').get_text()
-            
-            # Save it off
-            self.stats[label] = val
+    async def _arequest_statistics(self, ticker):
+        """
+        Coroutine version of _request_statistics() - parsing runs in a worker thread.
+        """
+        with Stock.instruments.time('fetch', ticker=ticker, events='statistics'):
+            html = await Stock.data_source().astatistics(ticker)
+
+        if html is None:
+            log.error('Could not retrieve statistics of %s', ticker)
+            return {}
+
+        return await asyncio.get_running_loop().run_in_executor(Stock._parse_executor(),
+                                                                self._parse_statistics, html)
+
+    def _parse_statistics(self, html):
+        """
+        Parse out the statistics of a key statistics page.
+
+        :param html: Page HTML
+        :returns: Dictionary of statistics by their label on the website
+        """
+        stats = {}
+
+        with Stock.instruments.time('stats', ticker=self.ticker):
+            stats_values = extract_statistics(html)
+
+            if stats_values is None:
+                log.error('Could not find statistics of %s', self.ticker)
+                return stats
+
+            # Iterate all statistic data pieces
+            for label, val in stats_values:
+                # Save it off
+                stats[label] = self._parse_stat(val)
+
+        return stats
+
+    def _load_history(self):
+        """
+        Request and parse historical data of a lazy stock, unless another thread already has.
+        """
+        with self._history_lock:
+            if 'stock' in self.__dict__:
+                return
+
+            start, end, interval, _ = self._lazy
+            stock = self._get_stock(self.ticker, start, end, interval, self.advanced)
+
+            # Parsing already set the index unless the request failed. The data is set last,
+            # so lookups made while loading wait for it rather than seeing an empty index.
+            if 'stock_index' not in self.__dict__:
+                self.stock_index = array('i')
+            self.stock = stock
+
+    def _load_statistics(self):
+        """
+        Request statistics of a lazy stock, unless another thread already has.
+        """
+        with self._stats_lock:
+            if 'stats' not in self.__dict__:
+                self.stats = self._request_statistics(self.ticker)
+
+    def _load_events(self):
+        """
+        Request dividends and splits of a lazy stock, unless another thread already has.
+        """
+        with self._events_lock:
+            if 'events' not in self.__dict__:
+                start, end, _, events = self._lazy
+                self.events = self._request_events(self.ticker, start, end) if events else None
+
+    def _request_events(self, ticker, start, end):
+        """
+        Request dividends and splits from Yahoo finance.
+
+        :param ticker: Stocks ticker
+        :param start: Start date for events
+        :param end: End date for events
+        :returns: Events instance, empty if the requests failed.
+        """
+        dividend_csv = self._request_csv(ticker, start, end, '1d', 'div')
+        split_csv = self._request_csv(ticker, start, end, '1d', 'split')
+
+        if dividend_csv is None or split_csv is None:
+            log.error('Could not retrieve dividends and splits of %s', ticker)
+
+        return Events.from_csv(dividend_csv, split_csv)
+
+    async def _arequest_events(self, ticker, start, end):
+        """
+        Coroutine version of _request_events() - dividends and splits are requested at the
+        same time.
+        """
+        dividend_csv, split_csv = await asyncio.gather(
+            self._arequest_csv(ticker, start, end, '1d', 'div'),
+            self._arequest_csv(ticker, start, end, '1d', 'split'))
+
+        if dividend_csv is None or split_csv is None:
+            log.error('Could not retrieve dividends and splits of %s', ticker)
+
+        return Events.from_csv(dividend_csv, split_csv)
 
     # Used for properly scaling numbers from Yahoo finance
     suffix_multiplier = {
@@ -407,15 +1188,11 @@ class Stock:
         
         :returns: parsed value if it can be parsed.
         """
-        date_regex = re.compile('^([\w]+)\s(\d{1,2})[,]\s(\d{4})')
-        percent_regex = '^([\d]+[.][\d]{2})[%]'
-        number_regex = '^([\d]+[.][\d]{2})([M|B|T])*'
-
         if val == 'N/A':
             return None
 
         # Simple numbers with potential Million/Billion suffixes
-        match=re.match(number_regex, val)
+        match=STAT_NUMBER_REGEX.match(val)
         if match:
             number = match.groups()[0]
             val = round(float(number),2)
@@ -427,14 +1204,14 @@ class Stock:
             return val
 
         # Percentages
-        match=re.match(percent_regex, val)
+        match=STAT_PERCENT_REGEX.match(val)
         if match:
             number = match.groups()[0]
             val = round(float(number),2)
             return val
 
         # Date of event of some sorts
-        match=re.match(date_regex, val)
+        match=STAT_DATE_REGEX.match(val)
         if match:
             g = match.groups()
             month = Stock.month_map[g[0]]
@@ -455,50 +1232,115 @@ class Stock:
         :param advanced: Flag to indicate if the stock should have an advanced structure built.
         :returns: Stock data structure - simple or advanced
         """
-
-        if not Stock._YAHOO_COOKIE or not Stock._YAHOO_CRUMB:
-            Stock._get_cookie_crumb()
-
-        # Request raw CSV
-        csv = self._request_csv(ticker, start, end, interval)
+        csv = self._fetch_csv(ticker, start, end, interval)
 
         if not csv:
-            #TODO: Retry with new cookie/crumb? At least once might help...
-            print("***ERROR*** Could not retrieve stock")
+            log.error('Could not retrieve stock %s', ticker)
             return None
 
         # Parse out data for easier manipulation
         return self._parse_stock_csv(csv, advanced)
 
-    def _request_csv(self, ticker, start, end, interval):
+    async def _aget_stock(self, ticker, start, end, interval, advanced=False):
+        """
+        Coroutine version of _get_stock() - parsing runs in a worker thread.
+        """
+        csv = await self._afetch_csv(ticker, start, end, interval)
+
+        if not csv:
+            log.error('Could not retrieve stock %s', ticker)
+            return None
+
+        return await asyncio.get_running_loop().run_in_executor(Stock._parse_executor(),
+                                                                self._parse_stock_csv, csv,
+                                                                advanced)
+
+    def _fetch_csv(self, ticker, start, end, interval):
+        """
+        Get raw historical CSV, through the history cache if there is one.
+
+        :param ticker: Stocks ticker
+        :param start: Start date for historical data
+        :param end: End date for historical data
+        :param interval: Interval for data points
+        :returns: CSV string, None if failed.
+        """
+        # Request raw CSV - only what's missing if cached
+        if Stock.history_cache:
+            start, end = self._resolve_dates(start, end)
+            return Stock.history_cache.load(
+                ticker, start, end, interval or '1d',
+                lambda start, end: self._request_csv(ticker, start, end, interval))
+
+        return self._request_csv(ticker, start, end, interval)
+
+    async def _afetch_csv(self, ticker, start, end, interval):
+        """
+        Coroutine version of _fetch_csv(). The history cache reads and writes files, so with
+        a cache the whole fetch runs in a worker thread.
+        """
+        if Stock.history_cache:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch_csv, ticker, start, end, interval)
+
+        return await self._arequest_csv(ticker, start, end, interval)
+
+    def _request_csv(self, ticker, start, end, interval, events='history'):
         """
-        Build request URL to download historical financial data from Yahoo finance.
+        Request historical financial data from the data source.
 
         :param ticker: Stocks ticker
         :param start: Start date for historical data
         :param end: End date for historical data
         :param interval: Interval for data points
-        :returns: Response from request URL, None if failed.
+        :param events: 'history' for prices, 'div' for dividends or 'split' for splits
+        :returns: CSV string, None if failed.
+        """
+        start, end = self._resolve_dates(start, end)
+        source = Stock.data_source()
+
+        with Stock.instruments.time('fetch', ticker=ticker, events=events):
+            if interval not in Stock.INTRADAY_CHUNK_DAYS:
+                return source.history(ticker, start, end, interval or '1d', events)
+
+            chunks = [source.history(ticker, chunk_start, chunk_end, interval, events)
+                      for chunk_start, chunk_end
+                      in date_chunks(start, end, Stock.INTRADAY_CHUNK_DAYS[interval])]
+
+        return self._join_chunks(ticker, chunks)
+
+    async def _arequest_csv(self, ticker, start, end, interval, events='history'):
+        """
+        Coroutine version of _request_csv().
         """
+        start, end = self._resolve_dates(start, end)
+        source = Stock.data_source()
 
-        # Format Parameters
-        start, end = self._format_dates(start, end)
+        with Stock.instruments.time('fetch', ticker=ticker, events=events):
+            if interval not in Stock.INTRADAY_CHUNK_DAYS:
+                return await source.ahistory(ticker, start, end, interval or '1d', events)
 
-        if not interval:
-            interval = '1d'
+            chunks = await asyncio.gather(*(
+                source.ahistory(ticker, chunk_start, chunk_end, interval, events)
+                for chunk_start, chunk_end
+                in date_chunks(start, end, Stock.INTRADAY_CHUNK_DAYS[interval])))
 
-        # Build request URL
-        url = REQUEST_URL % (ticker, start, end, interval, 'history', Stock._YAHOO_CRUMB)
+        return self._join_chunks(ticker, chunks)
 
-        if __debug__:
-            print("\nTicker: %s Start: %s End: %s Interval: %s Crumb: %s" 
-                  % (ticker, start, end, interval, Stock._YAHOO_CRUMB))
-            print(url)
+    def _join_chunks(self, ticker, chunks):
+        """
+        Join intraday CSV requested in chunks. Chunks that failed are left out - Yahoo only
+        keeps intraday bars for a limited time, so the oldest chunks of long ranges fail.
 
-        # Request data
-        response = requests.get(url, cookies={'B': Stock._YAHOO_COOKIE}).text
-        #TODO: Error check a bit?
-        return response
+        :param ticker: Stocks ticker
+        :param chunks: CSV strings (oldest first), None for chunks that failed
+        :returns: CSV string, None if every chunk failed.
+        """
+        failed = sum(1 for chunk in chunks if not chunk)
+        if failed:
+            log.warning('Could not retrieve %s of %s chunks of %s', failed, len(chunks), ticker)
+
+        return join_csv(chunks)
 
     def _parse_stock_csv(self, raw_csv, advanced=False):
         """
@@ -508,97 +1350,103 @@ class Stock:
         :param advanced: Flag indicating advanced features to be calculated
         :returns: Populated data structure for stock data
         """
-        stock_data = raw_csv.split('\n')[1:-1] # Exclude header and last blank line
-        
-        for i,data in enumerate(stock_data):
-            stock_data[i] = self._parse_day_str(data)
-
-        self._index_stock_data(stock_data)
+        with Stock.instruments.time('parse', ticker=self.ticker):
+            if self.intraday:
+                stock_data = IntradayHistory.from_csv(raw_csv)
+            elif self.compact:
+                stock_data = CompactHistory.from_csv(raw_csv)
+            elif self.columnar:
+                stock_data = History.from_csv(raw_csv)
+            else:
+                stock_data = raw_csv.split('\n')[1:-1] # Exclude header and last blank line
+
+                # Yahoo reports missing days as null across the board - skip them
+                stock_data = [self._parse_day_str(data) for data in stock_data
+                              if 'null' not in data]
+
+        with Stock.instruments.time('index', ticker=self.ticker):
+            self._index_stock_data(stock_data)
 
         # Check for advanced mode for more complicated calculations
         if advanced:
-            return self._advanced_index(stock_data) #TODO: Does nothing yet
+            with Stock.instruments.time('advanced', ticker=self.ticker):
+                return self._advanced_index(stock_data)
         else:
             return stock_data
 
     def _index_stock_data(self, stock_data):
         """
-        Loop over stock data and index dates for easier access in the future.
-        
-        Data is indexed as follows - to access more easily:
-        { <year> : { <month> : {FIRST_DAY_KEY:<index of first day in the month>}, ... }, ... }
-        
-        TODO: Consider creating a pseudo-hash function for dates to just key into an array index
-        given a date. Then there's not need to a dictionary for indexing, and we simply run date
-        values through a function to get indicies.
-        
-        Downside is that it's not as universally applicable across many dates IMO. But, I also
-        didn't think about it that hard...
-        """
-        n_day = 0
-        
-        for day in stock_data:
-            curr_date = day[0]
-            if self._is_new_first_day(curr_date):
-                self._index_first_day(curr_date, n_day)
-                
-            n_day += 1
-    
-    def _index_first_day(self, date, day_idx):
-        """
-        Index a day index for a particular month as the first day available.
-        
-        :param year: Year
-        :param month: Month
-        :param day_idx: Index in stock_data
+        Index dates for easier access in the future.
+
+        The index is a sorted array of date ordinals (datetime.toordinal()), one per day in
+        stock_data, so any date can be resolved to an index with a binary search. Columnar
+        data already holds its dates this way, so the index is a view over that column.
+        Intraday bars are indexed by their Unix timestamps (see History.keys) the same way.
+
+        :param stock_data: List of days or History instance
         """
-        if date.year not in self.stock_index:
-            self.stock_index[date.year] = {}
-        
-        if date.month not in self.stock_index[date.year]:
-            self.stock_index[date.year][date.month] = {}
-            
-        self.stock_index[date.year][date.month][Stock.FIRST_DAY_KEY] = day_idx
-        
-        if __debug__:
-            print('\tIndexed new first date: {} as index {}.'.format(date, day_idx))
-        
-    def _is_new_first_day(self, date):
+        if isinstance(stock_data, History):
+            # memoryview items are plain ints - much faster to bisect than NumPy scalars
+            self.stock_index = memoryview(stock_data.keys)
+        else:
+            self.stock_index = array('i', (day[0].toordinal() for day in stock_data))
+
+    def _append_days(self, days):
         """
-        Check if year/month was already indexed for the first day index.
-        
-        This shouldn't be called out of order, so first instance of year/month should
-        resolved to the first day...
-        
-        :param date: datetime instance
-        :returns: True if this date isn't indexed yet for a year/month combo
+        Append days to list based stock data and its index.
+
+        :param days: List of days (oldest first)
+        :returns: Index of the first day added or replaced, None if nothing changed.
         """
-        if date.year not in self.stock_index:
-            return True
-        
-        if date.month not in self.stock_index[date.year]:
-            return True
-            
-        return False
-    
-        
+        start = len(self.stock)
+
+        if start:
+            last = self.stock_index[-1]
+            days = [day for day in days if day[0].toordinal() >= last]
+
+            if days and days[0][0].toordinal() == last:
+                # Replace the last day
+                del self.stock[-1]
+                self.stock_index.pop()
+                start -= 1
+
+        if not days:
+            return None
+
+        self.stock.extend(days)
+        self.stock_index.extend(day[0].toordinal() for day in days)
+
+        return start
+
     def _advanced_index(self, stock_data):
         """
         Build an additional data structure for indexing key data for more advanced
         computation.
 
+        Indicators needed by most calculations (returns, moving averages, volatility, true
+        range) are computed once here, vectorized, and saved off as self.indicators.
+
         TODO:
         Store earning data on year level? Each year has a date and data for specific
         earnings - maybe also on month level?
+
+        :param stock_data: List of days or History instance
+        :returns: Stock data
         """
-        if __debug__:
-            print('Generating advanced data structure')
+        log.debug('Generating advanced data structure')
+
+        if not isinstance(stock_data, History):
+            stock_data_columns = History.from_rows(stock_data)
+        else:
+            stock_data_columns = stock_data
+
+        self.indicators = Indicators(stock_data_columns)
             
-        #TODO: What should we do about Dividends and Splits?
+        # Dividends and splits are kept in self.events - see adjusted()
 
         #TODO: What should we do about Earnings? (dates/expectations vs actual etc.)
 
-        return stock_data #TODO:
+        return stock_data
 
     def _parse_day_str(self, day_str):
         """
@@ -615,7 +1463,13 @@ class Stock:
         """
         data = day_str.split(',')
 
-        date = parse_date(data[0])
+        # Yahoo always sends YYYY-MM-DD, avoid the regex in parse_date
+        date = data[0]
+        if len(date) == 10:
+            date = datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]))
+        else:
+            date = parse_date(date)
+
         open = round(float(data[1]),2)
         high = round(float(data[2]),2)
         low = round(float(data[3]),2)
@@ -625,27 +1479,182 @@ class Stock:
 
         return [date, (open, high, low, close, adj_close, volume)]
 
-    def _format_dates(self, start, end):
+    def _init_storage(self, interval, columnar, compact):
         """
-        Return formatted date stamps as accepted by Yahoo finance API's - Unix timestamps.
+        Set the interval and how historical data is stored. Intraday bars are always
+        columnar.
+        """
+        self.interval = interval
+        self.intraday = interval in Stock.INTRADAY_CHUNK_DAYS
+        self.base_interval = None
+
+        if compact and self.intraday:
+            raise ValueError('Compact storage only holds daily bars')
 
-        :param start: Date string for starting date
-        :param end: Date string for ending date
-        :returns: Unix timestamps for both start and end dates
+        self.columnar = columnar or compact or self.intraday
+        self.compact = compact
+
+    def _resolve_dates(self, start, end):
         """
+        Return datetimes for a requested date range.
 
+        :param start: Date string or datetime for starting date
+        :param end: Date string or datetime for ending date
+        :returns: Start and end datetimes - YTD if either is missing
+        """
         if not start or not end:
             # Default to YTD
             today = datetime.now()
-            start = unix_date(datetime(today.year, 1, 1))
-            end = unix_date(today)
-        else:
-            # Parse dates
-            start = unix_date(parse_date(start))
-            end = unix_date(parse_date(end))
+            return datetime(today.year, 1, 1), today
+
+        if not isinstance(start, datetime):
+            start = parse_date(start)
+        if not isinstance(end, datetime):
+            end = parse_date(end)
 
         return start, end
 
+class YahooSource(DataSource):
+    """
+    Data downloaded from Yahoo finance, over the connection pool and cookie/crumb shared by
+    all stocks (see Stock.crumb_manager()).
+
+    Intraday bars come from the chart API, which answers in JSON rather than CSV. They're
+    converted to CSV (see chart_csv) so they're parsed like everything else.
+
+    Coroutine requests are made with aiohttp when it's installed, over a session of their
+    own for each event loop (see aclose()). Without aiohttp they run in worker threads.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._session_loop = None
+
+    def history(self, ticker, start, end, interval, events='history'):
+        url_format, start, end = self._history_request(start, end, interval)
+
+        def fetch(cookie, crumb):
+            # Build request URL
+            url = url_format % (ticker, start, end, interval, events, crumb)
+
+            log.debug('Ticker: %s Start: %s End: %s Interval: %s Crumb: %s',
+                      ticker, start, end, interval, crumb)
+            log.debug(url)
+
+            return Stock._get_session().get(url, cookies={'B': cookie})
+
+        # Request data - refreshes the cookie/crumb and retries as needed
+        response = Stock.crumb_manager().request(fetch)
+
+        if response is None or not response.ok:
+            return None
+
+        return self._history_text(response.text, interval)
+
+    def statistics(self, ticker):
+        request_url = STATS_URL % (ticker, ticker)
+
+        response = Stock.crumb_manager().request(
+            lambda cookie, crumb: Stock._get_session().get(request_url), authenticate=False)
+
+        if response is None or not response.ok:
+            return None
+
+        return response.text
+
+    async def ahistory(self, ticker, start, end, interval, events='history'):
+        if aiohttp is None:
+            return await super().ahistory(ticker, start, end, interval, events)
+
+        url_format, start, end = self._history_request(start, end, interval)
+
+        async def fetch(cookie, crumb):
+            url = url_format % (ticker, start, end, interval, events, crumb)
+            log.debug(url)
+
+            return await self._aget(url, {'B': cookie})
+
+        response = await Stock.crumb_manager().arequest(fetch)
+
+        if response is None or not response.ok:
+            return None
+
+        return self._history_text(response.text, interval)
+
+    async def astatistics(self, ticker):
+        if aiohttp is None:
+            return await super().astatistics(ticker)
+
+        request_url = STATS_URL % (ticker, ticker)
+
+        response = await Stock.crumb_manager().arequest(
+            lambda cookie, crumb: self._aget(request_url), authenticate=False)
+
+        if response is None or not response.ok:
+            return None
+
+        return response.text
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _history_request(self, start, end, interval):
+        """
+        URL and period of a historical data request. Intraday bars are requested for whole
+        UTC days.
+
+        :returns: Tuple of (URL format, start, end) - start and end as Unix timestamps
+        """
+        if interval in Stock.INTRADAY_CHUNK_DAYS:
+            return (CHART_URL, IntradayHistory.to_key(start.date()),
+                    IntradayHistory.to_key(end.date() + timedelta(days=1)))
+
+        return REQUEST_URL, unix_date(start), unix_date(end)
+
+    def _history_text(self, text, interval):
+        """
+        Historical data as CSV - chart API JSON of intraday bars is converted.
+        """
+        if interval in Stock.INTRADAY_CHUNK_DAYS:
+            return chart_csv(text)
+
+        return text
+
+    async def _aget(self, url, cookies=None):
+        """
+        GET a URL over the aiohttp session of the running event loop.
+
+        :returns: AsyncResponse, None if the request couldn't be made.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Stock.POOL_SIZE))
+            self._session_loop = loop
+
+        try:
+            async with self._session.get(url, cookies=cookies) as response:
+                return AsyncResponse(response.status, await response.text(encoding='utf-8'))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+class AsyncResponse:
+    """
+    Status and body of a coroutine request, read in full before its connection is released.
+    """
+
+    __slots__ = ('status_code', 'text')
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
 #--------------------------------------------------------------------------
 # Helper functions
 #----
@@ -661,25 +1670,188 @@ def parse_date(date_str):
         "1990.1.15"
         "1990-01-15"
 
+    A time of day may follow, for intraday bars:
+        "1990-01-15 09:30"
+        "1990-01-15T09:30:00"
+
     :param date_str: Date string which may or may not contain a valid date
     :return: A valid datetime instance
     """
-    date_regex = re.compile('(\d{4})(?P<seperator>[./-])(\d{1,2})(?P=seperator)(\d{1,2})')
-
-    match = re.match(date_regex, date_str)
+    match = DATE_REGEX.match(date_str)
+    hour, minute, second = 0, 0, 0
 
     if match:
         groups = match.groups()
         year = int(groups[0])
         month = int(groups[2])
         day = int(groups[3])
+
+        time_match = TIME_REGEX.match(date_str, match.end())
+        if time_match:
+            hour, minute, second = (int(value or 0) for value in time_match.groups())
     else:
         year, month, day = 1970, 1, 1 # We should probably throw an exception here?
 
     #TODO: Support dates prior to epoch (1970/1/1) on various platforms 
     #   https://stackoverflow.com/questions/2518706/python-mktime-overflow-error
 
-    return datetime(year, month, day)
+    return datetime(year, month, day, hour, minute, second)
+
+def is_date_batch(date):
+    """
+    Check if a date argument holds many dates rather than one - any sequence other than a
+    string (list, tuple, range, ...) or anything NumPy can convert to an array of dates
+    (ndarray, pandas Index or Series, ...).
+    """
+    if isinstance(date, (str, bytes)):
+        return False
+    if isinstance(date, Sequence):
+        return True
+    return np is not None and hasattr(date, '__array__') and np.ndim(date) > 0
+
+def date_ordinals(dates):
+    """
+    Convert many dates to date ordinals (datetime.toordinal()) at once.
+
+    YYYY-MM-DD strings and NumPy datetime64 arrays are converted vectorized, other strings
+    go through parse_date one at a time.
+
+    :param dates: Sequence or array of datetimes, dates, date strings, datetime64 or date
+        ordinals
+    :returns: int64 array of ordinals
+    """
+    if not isinstance(dates, (np.ndarray, Sequence)) and hasattr(dates, '__array__'):
+        dates = np.asarray(dates) # pandas Index, Series, ...
+    if not isinstance(dates, np.ndarray):
+        dates = list(dates)
+        if all(isinstance(date, date_type) for date in dates):
+            return np.fromiter((date.toordinal() for date in dates), np.int64, len(dates))
+        dates = np.array(dates)
+
+    if dates.dtype.kind == 'M':
+        return dates.astype('datetime64[D]').astype(np.int64) + History.EPOCH_ORDINAL
+
+    if dates.dtype.kind in 'iu':
+        return dates.astype(np.int64)
+
+    if dates.dtype.kind == 'U':
+        try:
+            return date_ordinals(dates.astype('datetime64[D]'))
+        except ValueError:
+            pass # Not all YYYY-MM-DD
+
+    return np.fromiter((date.toordinal() if isinstance(date, date_type)
+                        else parse_date(date).toordinal() for date in dates.tolist()),
+                       np.int64, len(dates))
+
+def date_timestamps(dates):
+    """
+    Convert many dates to Unix timestamps (seconds, UTC) at once, like date_ordinals. Dates
+    without a time of day are midnight, naive datetimes are UTC.
+
+    :param dates: Sequence or array of datetimes, dates, date strings, datetime64 or Unix
+        timestamps
+    :returns: int64 array of timestamps
+    """
+    if not isinstance(dates, (np.ndarray, Sequence)) and hasattr(dates, '__array__'):
+        dates = np.asarray(dates) # pandas Index, Series, ...
+    if not isinstance(dates, np.ndarray):
+        dates = list(dates)
+        if all(isinstance(date, date_type) for date in dates):
+            return np.fromiter((IntradayHistory.to_key(date) for date in dates), np.int64,
+                               len(dates))
+        dates = np.array(dates)
+
+    if dates.dtype.kind == 'M':
+        return dates.astype('datetime64[s]').astype(np.int64)
+
+    if dates.dtype.kind in 'iu':
+        return dates.astype(np.int64)
+
+    if dates.dtype.kind == 'U':
+        try:
+            return date_timestamps(dates.astype('datetime64[s]'))
+        except ValueError:
+            pass # Not all ISO dates
+
+    return np.fromiter((IntradayHistory.to_key(date if isinstance(date, date_type)
+                                               else parse_date(date))
+                        for date in dates.tolist()), np.int64, len(dates))
+
+def date_chunks(start, end, days):
+    """
+    Split a range of days into ranges of at most days days.
+
+    :param start: datetime of the first day
+    :param end: datetime of the last day
+    :param days: Most days in a range
+    :returns: List of (start, end) datetimes, oldest first
+    """
+    start = datetime(start.year, start.month, start.day)
+    end = datetime(end.year, end.month, end.day)
+    chunks = []
+
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+
+    return chunks
+
+def join_csv(chunks):
+    """
+    Join CSV downloaded in chunks into one, with a single header.
+
+    :param chunks: CSV strings (oldest first) - None or empty for chunks that failed
+    :returns: CSV string, None if there are no chunks to join.
+    """
+    chunks = [chunk for chunk in chunks if chunk]
+    if not chunks:
+        return None
+
+    lines = [chunks[0].partition('\n')[0]]
+    for chunk in chunks:
+        lines.extend(line for line in chunk.partition('\n')[2].split('\n') if line)
+
+    return '\n'.join(lines) + '\n'
+
+def chart_csv(raw_json):
+    """
+    Convert Yahoo finance chart JSON to historical CSV, dated by the UTC time each bar
+    starts ('YYYY-MM-DD HH:MM:SS').
+
+    The chart API has no adjusted closes for intraday bars, so Adj Close is the close. Bars
+    without prices are written as null, like missing days in historical CSV.
+
+    :param raw_json: JSON string as returned from the chart API
+    :returns: CSV string, None if the JSON doesn't hold a chart.
+    """
+    try:
+        chart = json.loads(raw_json)['chart']
+    except (ValueError, KeyError):
+        return None
+
+    if chart.get('error') or not chart.get('result'):
+        return None
+
+    result = chart['result'][0]
+    lines = [CSV_HEADER]
+
+    timestamps = result.get('timestamp') or []
+    if timestamps:
+        quote = result['indicators']['quote'][0]
+        columns = [quote[name] for name in ('open', 'high', 'low', 'close', 'close', 'volume')]
+
+        for i, timestamp in enumerate(timestamps):
+            date = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
+            values = [column[i] for column in columns]
+
+            if None in values:
+                lines.append(date + ',null' * len(values))
+            else:
+                lines.append('%s,%s,%s,%s,%s,%s,%d' % tuple([date] + values))
+
+    return '\n'.join(lines) + '\n'
 
 def unix_date(date):
     """
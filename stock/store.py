@@ -0,0 +1,175 @@
+import mmap
+import os
+
+from .history import History, np
+from .stock import Stock
+
+class Universe:
+    """
+    Read-only universe of stocks backed by a memory mapped binary file.
+
+    The file holds fixed width columns for every ticker, so opening it costs next to nothing
+    and stocks are zero-copy views over the mapped pages. Processes opening the same file
+    share one copy of it in the page cache.
+
+    Layout (little endian, each section 8 byte aligned):
+
+        header    - magic 'STKU', format version, number of tickers, total number of days
+        directory - per ticker: ticker (16 bytes ASCII), first row, number of rows
+        dates     - int32[rows] date ordinals
+        open      - float64[rows]
+        high      - float64[rows]
+        low       - float64[rows]
+        close     - float64[rows]
+        adj_close - float64[rows]
+        volume    - int64[rows]
+
+    Each ticker's days are one contiguous run of rows in every column (oldest first).
+    """
+
+    MAGIC = b'STKU'
+    VERSION = 1
+
+    HEADER_DTYPE = [('magic', 'S4'), ('version', '<u4'), ('tickers', '<u8'), ('rows', '<u8')]
+    DIRECTORY_DTYPE = [('ticker', 'S16'), ('start', '<i8'), ('count', '<i8')]
+    COLUMN_DTYPES = [('dates', '<i4'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+                     ('close', '<f8'), ('adj_close', '<f8'), ('volume', '<i8')]
+
+    def __init__(self, path):
+        """
+        :param path: Path of a file written by Universe.write
+        """
+        if np is None:
+            raise ImportError('NumPy is required for a stock universe')
+
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = np.frombuffer(self._mmap, Universe.HEADER_DTYPE, 1)[0]
+        if header['magic'] != Universe.MAGIC or header['version'] != Universe.VERSION:
+            raise ValueError('%s is not a version %s stock universe' % (path, Universe.VERSION))
+
+        n_tickers = int(header['tickers'])
+        rows = int(header['rows'])
+        offsets = Universe._offsets(n_tickers, rows)
+
+        directory = np.frombuffer(self._mmap, Universe.DIRECTORY_DTYPE, n_tickers,
+                                  offsets['directory'])
+        self._directory = {entry['ticker'].decode('ascii') : (int(entry['start']),
+                                                               int(entry['count']))
+                           for entry in directory}
+
+        self._columns = [np.frombuffer(self._mmap, dtype, rows, offsets[name])
+                         for name, dtype in Universe.COLUMN_DTYPES]
+
+    @classmethod
+    def write(cls, path, stocks):
+        """
+        Write stocks out as a universe file. The file is replaced atomically.
+
+        :param path: Path of the universe file
+        :param stocks: Iterable of Stock instances
+        """
+        if np is None:
+            raise ImportError('NumPy is required for a stock universe')
+
+        histories = [(stock.ticker, stock.history) for stock in stocks]
+
+        for ticker, history in histories:
+            if history.KEY != 'dates':
+                raise ValueError('Universe files only hold daily bars, %s is intraday' % ticker)
+
+        directory = np.zeros(len(histories), cls.DIRECTORY_DTYPE)
+        rows = 0
+        for i, (ticker, history) in enumerate(histories):
+            directory[i] = (ticker.encode('ascii'), rows, len(history))
+            rows += len(history)
+
+        header = np.array([(cls.MAGIC, cls.VERSION, len(histories), rows)], cls.HEADER_DTYPE)
+        offsets = cls._offsets(len(histories), rows)
+
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes())
+
+            f.seek(offsets['directory'])
+            f.write(directory.tobytes())
+
+            for name, dtype in cls.COLUMN_DTYPES:
+                f.seek(offsets[name])
+                for _, history in histories:
+                    f.write(np.asarray(getattr(history, name), dtype).tobytes())
+
+            # Pad out the last column
+            f.truncate(offsets['end'])
+
+        os.replace(tmp_path, path)
+
+    @property
+    def tickers(self):
+        """
+        Tickers in the universe, in the order they were written.
+        """
+        return list(self._directory)
+
+    def history(self, ticker):
+        """
+        Get a ticker's historical data as a view on the file.
+
+        :param ticker: Stocks ticker
+        :returns: History instance
+        """
+        start, count = self._directory[ticker.upper()]
+        return History(*[column[start:start + count] for column in self._columns])
+
+    def stock(self, ticker, advanced=False):
+        """
+        Get a columnar Stock for a ticker. History isn't copied out of the file.
+
+        :param ticker: Stocks ticker
+        :param advanced: Flag to indicate if the stock should have an advanced structure built.
+        :returns: Stock instance
+        """
+        return Stock.from_history(ticker, self.history(ticker), advanced)
+
+    def __len__(self):
+        return len(self._directory)
+
+    def __contains__(self, ticker):
+        return ticker.upper() in self._directory
+
+    def __iter__(self):
+        return iter(self._directory)
+
+    def __getitem__(self, ticker):
+        return self.stock(ticker)
+
+    def __repr__(self):
+        return 'Universe(%s, %s tickers)' % (self.path, len(self))
+
+    #--------------------------------------------------------------------------
+    # Static functions
+    #----
+
+    @staticmethod
+    def _offsets(n_tickers, rows):
+        """
+        Byte offsets of each section for a given number of tickers and days.
+
+        :returns: Dictionary of section name to offset, plus 'end' for the file size
+        """
+        def align(offset):
+            return (offset + 7) // 8 * 8
+
+        offsets = {'directory' : align(np.dtype(Universe.HEADER_DTYPE).itemsize)}
+        offset = offsets['directory'] + n_tickers * np.dtype(Universe.DIRECTORY_DTYPE).itemsize
+
+        for name, dtype in Universe.COLUMN_DTYPES:
+            offsets[name] = offset = align(offset)
+            offset += rows * np.dtype(dtype).itemsize
+
+        offsets['end'] = align(offset)
+
+        return offsets
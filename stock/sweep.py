@@ -0,0 +1,217 @@
+import itertools
+import json
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .store import Universe
+
+# Set in each worker process by _init_worker
+_UNIVERSE = None
+_STRATEGY = None
+_ADVANCED = False
+
+class Sweep:
+    """
+    Run a strategy for every combination of parameters on every ticker of a universe, over
+    a pool of processes.
+
+    Prices are never sent to the workers. Each worker memory maps the universe file once
+    (see Universe), so all of them share one copy of the data through the page cache, and
+    tasks only carry a ticker and its parameter sets. Every parameter set of a ticker runs in
+    one task so the stock is only set up once per worker.
+
+    The strategy is called as strategy(stock, **params) and returns the result to keep. It
+    must be a module level function so it can be sent to the workers.
+
+    With a checkpoint file, every result is appended to it (one JSON line each) as soon as
+    its ticker finishes. Running the same sweep again skips what the checkpoint already holds,
+    so a crashed sweep resumes where it stopped. Results must be JSON serializable then.
+    """
+
+    def __init__(self, universe, strategy, grid, checkpoint=None, advanced=False,
+                 processes=None):
+        """
+        :param universe: Path of a universe file (see Universe.write)
+        :param strategy: Function taking (stock, **params) and returning a result
+        :param grid: Dictionary of parameter name to sequence of values to try
+        :param checkpoint: Path of the checkpoint file, None to not checkpoint
+        :param advanced: Flag to build advanced structures (indicators) for the stocks.
+        :param processes: Number of worker processes, defaults to the number of CPUs
+        """
+        self.universe = universe
+        self.strategy = strategy
+        self.grid = grid
+        self.checkpoint = checkpoint
+        self.advanced = advanced
+        self.processes = processes
+
+        # (ticker, params key) to error message of parameter sets that failed
+        self.errors = {}
+
+    @property
+    def parameter_sets(self):
+        """
+        Every combination of the grid's values, as dictionaries.
+        """
+        names = sorted(self.grid)
+        return [dict(zip(names, values))
+                for values in itertools.product(*(self.grid[name] for name in names))]
+
+    def run(self, tickers=None):
+        """
+        Run the sweep, yielding results as they finish. Results already in the checkpoint
+        are yielded first. Parameter sets that fail are left out and reported in errors.
+
+        :param tickers: Tickers to run, defaults to every ticker in the universe
+        :returns: Generator of (ticker, params, result)
+        """
+        if tickers is None:
+            tickers = Universe(self.universe).tickers
+        tickers = [ticker.upper() for ticker in tickers]
+
+        parameter_sets = self.parameter_sets
+        wanted = set(tickers)
+        keys = set(params_key(params) for params in parameter_sets)
+        done = set()
+
+        for ticker, params, result in self.completed():
+            key = (ticker, params_key(params))
+            if ticker in wanted and key[1] in keys and key not in done:
+                done.add(key)
+                yield ticker, params, result
+
+        jobs = []
+        for ticker in tickers:
+            todo = [params for params in parameter_sets
+                    if (ticker, params_key(params)) not in done]
+            if todo:
+                jobs.append((ticker, todo))
+
+        if not jobs:
+            return
+
+        checkpoint = self._open_checkpoint() if self.checkpoint else None
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                     initargs=(self.universe, self.strategy,
+                                               self.advanced)) as executor:
+                futures = [executor.submit(_run_ticker, ticker, todo) for ticker, todo in jobs]
+
+                try:
+                    for future in as_completed(futures):
+                        ticker, outcomes = future.result()
+
+                        for params, result, error in outcomes:
+                            if error is not None:
+                                self.errors[(ticker, params_key(params))] = error
+                                continue
+
+                            if checkpoint:
+                                checkpoint.write(json.dumps({'ticker' : ticker,
+                                                             'params' : params,
+                                                             'result' : result}) + '\n')
+                            yield ticker, params, result
+
+                        if checkpoint:
+                            checkpoint.flush()
+                            os.fsync(checkpoint.fileno())
+                finally:
+                    # Stopped early - don't wait for tasks that haven't started
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if checkpoint:
+                checkpoint.close()
+
+    def completed(self):
+        """
+        Read results saved in the checkpoint. A line cut short by a crash is ignored.
+
+        :returns: List of (ticker, params, result)
+        """
+        results = []
+
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return results
+
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                results.append((entry['ticker'], entry['params'], entry['result']))
+
+        return results
+
+    #--------------------------------------------------------------------------
+    # Private functions
+    #----
+
+    def _open_checkpoint(self):
+        """
+        Open the checkpoint for appending. A line cut short by a crash is removed first, so
+        the next result doesn't run into it.
+
+        :returns: File object
+        """
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, 'rb+') as f:
+                size = end = f.seek(0, os.SEEK_END)
+
+                # Find the end of the last complete line, reading back a block at a time
+                while end > 0:
+                    start = max(end - 4096, 0)
+                    f.seek(start)
+                    newline = f.read(end - start).rfind(b'\n')
+                    if newline >= 0:
+                        end = start + newline + 1
+                        break
+                    end = start
+
+                if end < size:
+                    f.truncate(end)
+
+        return open(self.checkpoint, 'a')
+
+#--------------------------------------------------------------------------
+# Helper functions
+#----
+def params_key(params):
+    """
+    Hashable key of a parameter set.
+    """
+    return json.dumps(params, sort_keys=True)
+
+def _init_worker(path, strategy, advanced):
+    """
+    Open the universe once per worker process.
+    """
+    global _UNIVERSE, _STRATEGY, _ADVANCED
+
+    _UNIVERSE = Universe(path)
+    _STRATEGY = strategy
+    _ADVANCED = advanced
+
+def _run_ticker(ticker, parameter_sets):
+    """
+    Run every parameter set for one ticker in a worker.
+
+    :returns: Tuple of (ticker, [(params, result, error message or None)])
+    """
+    outcomes = []
+
+    try:
+        stock = _UNIVERSE.stock(ticker, _ADVANCED)
+    except Exception as e:
+        return ticker, [(params, None, repr(e)) for params in parameter_sets]
+
+    for params in parameter_sets:
+        try:
+            outcomes.append((params, _STRATEGY(stock, **params), None))
+        except Exception as e:
+            outcomes.append((params, None, repr(e)))
+
+    return ticker, outcomes
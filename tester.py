@@ -1,6 +1,36 @@
-from tests import BASIC_TESTS, RANGE_TESTS
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
 
+from datetime import datetime
+
+from tests import BASIC_TESTS, RANGE_TESTS, OFFLINE_HISTORY, OFFLINE_STATISTICS, \
+                  OFFLINE_STATISTICS_TESTS, SPLIT_HISTORY, SPLIT_DIVIDENDS, SPLIT_SPLITS, \
+                  INTRADAY_HISTORY
+
+import stock.stock
+
+from stock import arrow
+from stock.backtest import backtest, backtest_many
+from stock.batch import Panel
+from stock.cache import HistoryCache
+from stock.history import CompactHistory, History, np
+from stock.sources import LocalSource
 from stock.stock import Stock, parse_date
+from stock.store import Universe
+from stock.sweep import Sweep
+
+# Only run the tests that don't need Yahoo finance
+OFFLINE = '--offline' in sys.argv
+
+# Cases that failed, the exit status is 1 if there are any
+FAILED_CASES = []
 
 def report_result(result, case_num, data, exp_data):
     """
@@ -9,6 +39,7 @@ def report_result(result, case_num, data, exp_data):
     if result:
         print('    Case %s: PASSED' % case_num)
     else:
+        FAILED_CASES.append(case_num)
         print('    Case %s: FAILED' % case_num)
         print('     EXPECTED: ' + str(exp_data))
         print('     RETURNED: ' + str(data))
@@ -28,60 +59,792 @@ def verify_day(day_info, expected):
     return True
 
 
-# Basic tests for single dates
-for test in BASIC_TESTS:
-    print('\nRunning basic tests for %s' % test)
-    test_stock = Stock(test, '2017-01-01', '2017-12-01')
+# Tests against Yahoo finance
+if not OFFLINE:
+    # Basic tests for single dates
+    for test in BASIC_TESTS:
+        print('\nRunning basic tests for %s' % test)
+        test_stock = Stock(test, '2017-01-01', '2017-12-01')
 
-    case_num = 1
-    for case in BASIC_TESTS[test]:
-        date = case[0]
-        print('  Date: %s' % date)
+        case_num = 1
+        for case in BASIC_TESTS[test]:
+            date = case[0]
+            print('  Date: %s' % date)
 
-        # Get data for test case
-        expected_data = case[1]
-        day_info = test_stock.day_info(date)
-        ret = verify_day(day_info[1], expected_data)
+            # Get data for test case
+            expected_data = case[1]
+            day_info = test_stock.day_info(date)
+            ret = verify_day(day_info[1], expected_data)
 
-        # Report results
-        report_result(ret, case_num, day_info[1], expected_data)
+            # Report results
+            report_result(ret, case_num, day_info[1], expected_data)
+
+            day_info = [test_stock.open(date), test_stock.high(date), test_stock.low(date), test_stock.close(date), test_stock.adj_close(date), test_stock.volume(date)]
+            ret = verify_day(day_info, expected_data)
 
-        day_info = [test_stock.open(date), test_stock.high(date), test_stock.low(date), test_stock.close(date), test_stock.adj_close(date), test_stock.volume(date)]
-        ret = verify_day(day_info, expected_data)
+            # Report results
+            report_result(ret, case_num+0.1, day_info, expected_data)
 
-        # Report results
-        report_result(ret, case_num+0.1, day_info, expected_data)
+            case_num += 1
 
-        case_num += 1
+    # Run range testing
+    for test in RANGE_TESTS:
+        test_case = RANGE_TESTS[test]
+        start_date = test_case['start']
+        end_date = test_case['end']
 
-# Run range testing
-for test in RANGE_TESTS:
-    test_case = RANGE_TESTS[test]
-    start_date = test_case['start']
-    end_date = test_case['end']
+        print('\nRunning range tests for %s from %s to %s' % (test, start_date, end_date))
+        test_stock = Stock(test, start_date, end_date)
 
-    print('\nRunning range tests for %s from %s to %s' % (test, start_date, end_date))
-    test_stock = Stock(test, start_date, end_date)
+        expected_data = test_case['expected']
+        num_cases = len(expected_data)
+        stock_data = test_stock.day_info(start_date, end_date)
 
-    expected_data = test_case['expected']
-    num_cases = len(expected_data)
-    stock_data = test_stock.day_info(start_date, end_date)
+        exp_idx = 0;
+        for day in stock_data:
+            exp_date = parse_date(expected_data[exp_idx][0])
+            if exp_date == day[0]:
+                # This is one of the testing dates
+                ret = verify_day(day[1], expected_data[exp_idx][1])
 
-    exp_idx = 0;
-    for day in stock_data:
-        exp_date = parse_date(expected_data[exp_idx][0])
-        if exp_date == day[0]:
-            # This is one of the testing dates
-            ret = verify_day(day[1], expected_data[exp_idx][1])
+                # Report results
+                report_result(ret, exp_idx+1, day[1], expected_data[exp_idx][1])
 
-            # Report results
-            report_result(ret, exp_idx+1, day[1], expected_data[exp_idx][1])
+                exp_idx += 1
+
+        if exp_idx != num_cases:
+            # In some cases this is good because we want to test boundaries which don't include extra days
+            print('***WARNING*** Not all test cases were encountered. %s were skipped. Verify this is expected.' % (num_cases - exp_idx))
+
+
+# More testing added below as new features added -- or make a new file?
+
+#--------------------------------------------------------------------------
+# Offline tests
+#----
+class StandInServer:
+    """
+    Stand-in for Yahoo finance on localhost, serving OFFLINE_HISTORY and OFFLINE_STATISTICS
+    from an asyncio server in a background thread. Stocks are pointed at it with install().
+
+    Like Yahoo, historical data is only served for the current cookie and crumb, which
+    expire_crumb() replaces, and only for the days requested. Set failures to answer that
+    many historical data requests with 503 first.
+
+    Historical data requests are recorded in history_requests as (ticker, events, first
+    day, last day).
+    """
+
+    def __init__(self):
+        self.crumb = 'crumb0'
+        self.failures = 0
+        self.requests = 0
+        self.connections = 0
+        self.history_requests = []
+
+        self._ready = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True).start()
+        self._ready.wait()
+
+    def install(self):
+        """
+        Send every request of Stock to the server.
+        """
+        base = 'http://127.0.0.1:%s' % self.port
+
+        stock.stock.REQUEST_URL = base + '/v7/finance/download/%s' \
+                                  '?period1=%s&period2=%s&interval=%s&events=%s&crumb=%s'
+        stock.stock.STATS_URL = base + '/quote/%s/key-statistics?p=%s'
+        stock.stock.COOKIE_URL = base + '/quote/SPY/history'
+        Stock.source = None
+
+        # Don't wait long between retries
+        Stock.crumb_manager().backoff = 0.01
+
+    def expire_crumb(self):
+        """
+        Reject the cookie and crumb handed out so far.
+        """
+        self.crumb = 'crumb%s' % (int(self.crumb[5:]) + 1)
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+        await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        """
+        Answer the requests of a connection (HTTP/1.1 keep alive) until it's closed.
+        """
+        self.connections += 1
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                status, body, extra_headers = self._respond(request_line.split()[1].decode(),
+                                                            headers.get('cookie', ''))
+                body = body.encode()
+
+                writer.write(('HTTP/1.1 %s Stand-in\r\nContent-Length: %s\r\n%s\r\n'
+                              % (status, len(body), extra_headers)).encode() + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, path, cookie):
+        """
+        :returns: Tuple of (status, body, extra header lines)
+        """
+        if path.startswith('/quote/SPY/history'):
+            return (200, '<html>\n{"CrumbStore":{"crumb":"%s"}}\n</html>' % self.crumb,
+                    'Set-Cookie: B=%s\r\n' % self.crumb)
+
+        match = re.match(r'/v7/finance/download/([^?]+)\?period1=(\d+)&period2=(\d+)'
+                         r'.*&events=(\w+)&crumb=(\w+)', path)
+        if match:
+            ticker, start, end, events, crumb = match.groups()
+            start, end = [datetime.fromtimestamp(int(stamp)).strftime('%Y-%m-%d')
+                          for stamp in (start, end)]
+            self.requests += 1
+            self.history_requests.append((ticker, events, start, end))
+
+            if self.failures:
+                self.failures -= 1
+                return 503, 'Service unavailable', ''
+            if crumb != self.crumb or cookie != 'B=%s' % self.crumb:
+                return 401, 'Invalid cookie', ''
+            if ticker not in OFFLINE_HISTORY:
+                return 404, 'No data found, symbol may be delisted', ''
+            if events == 'history':
+                header, _, body = OFFLINE_HISTORY[ticker].partition('\n')
+                lines = [line for line in body.splitlines() if start <= line[:10] <= end]
+                return 200, '\n'.join([header] + lines) + '\n', ''
+            return 200, 'Date,%s\n' % ('Dividends' if events == 'div' else 'Stock Splits'), ''
+
+        if re.match(r'/quote/[^/]+/key-statistics', path):
+            return 200, OFFLINE_STATISTICS, ''
+
+        return 404, 'Not found', ''
+
+class SlowSource(LocalSource):
+    """
+    Local files that take a while to read, like a slow connection.
+    """
+
+    def history(self, ticker, start, end, interval, events='history'):
+        time.sleep(0.5)
+        return super().history(ticker, start, end, interval, events)
+
+def write_history(path, history):
+    """
+    Write historical data of tickers to a directory, as LocalSource reads them.
+    """
+    for ticker, raw_csv in history.items():
+        with open('%s/%s.csv' % (path, ticker), 'w') as f:
+            f.write(raw_csv)
+
+def run_async(coroutine):
+    """
+    Run a coroutine in an event loop of its own, closing the connections it left open.
+    """
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await Stock.data_source().aclose()
+
+    return asyncio.run(run())
+
+def verify_basic_cases(test_stock, cases):
+    """
+    Run the cases of BASIC_TESTS for one stock.
+    """
+    for case_num, case in enumerate(cases, 1):
+        day_info = test_stock.day_info(case[0])
+        report_result(verify_day(day_info[1], case[1]), case_num, day_info[1], case[1])
+
+def verify_range_case(test_stock, test_case):
+    """
+    Run a case of RANGE_TESTS - every day of the range must be an expected one.
+    """
+    stock_data = test_stock.day_info(test_case['start'], test_case['end'])
+    expected = [(parse_date(date), values) for date, values in test_case['expected']]
+
+    report_result([(day[0], list(day[1])) for day in stock_data] == expected,
+                  1, stock_data, expected)
+
+server = StandInServer()
+server.install()
+
+# Loading many stocks at once
+print('\nRunning load_many tests against a stand-in server')
+stocks, errors = Stock.load_many(['ROKU', 'MU', 'NOPE'], '2017-01-01', '2017-12-01')
+
+print('  ROKU')
+verify_basic_cases(stocks['ROKU'], BASIC_TESTS['ROKU'])
+print('  MU')
+verify_range_case(stocks['MU'], RANGE_TESTS['MU'])
+print('  Statistics')
+report_result(stocks['ROKU'].stats == OFFLINE_STATISTICS_TESTS, 1, stocks['ROKU'].stats,
+              OFFLINE_STATISTICS_TESTS)
+print('  Errors are reported per ticker')
+report_result(list(stocks) == ['ROKU', 'MU'] and list(errors) == ['NOPE'], 1,
+              (list(stocks), list(errors)), (['ROKU', 'MU'], ['NOPE']))
+
+print('  Connections are reused')
+connections = server.connections
+Stock.load_many(['ROKU', 'MU'], '2017-01-01', '2017-12-01', max_workers=1)
+report_result(server.connections == connections, 1, server.connections, connections)
+
+print('  Expired crumbs are refreshed once')
+counters = Stock.crumb_manager().counters
+server.expire_crumb()
+stocks, errors = Stock.load_many(['ROKU', 'MU', 'ROKU', 'MU'], '2017-01-01', '2017-12-01',
+                                 max_workers=4)
+refreshes = Stock.crumb_manager().counters['refreshes'] - counters['refreshes']
+report_result(not errors and refreshes == 1, 1, (errors, refreshes), ({}, 1))
+
+# Loading many stocks with asyncio
+print('\nRunning aload_many tests against a stand-in server')
+stocks, errors = run_async(Stock.aload_many(['ROKU', 'MU', 'NOPE'], '2017-01-01', '2017-12-01',
+                                            columnar=True))
+
+print('  ROKU')
+verify_basic_cases(stocks['ROKU'], BASIC_TESTS['ROKU'])
+print('  MU')
+verify_range_case(stocks['MU'], RANGE_TESTS['MU'])
+print('  Statistics')
+report_result(stocks['ROKU'].stats == OFFLINE_STATISTICS_TESTS, 1, stocks['ROKU'].stats,
+              OFFLINE_STATISTICS_TESTS)
+print('  Errors are reported per ticker')
+report_result(list(stocks) == ['ROKU', 'MU'] and list(errors) == ['NOPE'], 1,
+              (list(stocks), list(errors)), (['ROKU', 'MU'], ['NOPE']))
+
+print('  Expired crumbs are refreshed once')
+counters = Stock.crumb_manager().counters
+server.expire_crumb()
+stocks, errors = run_async(Stock.aload_many(['ROKU', 'MU'], '2017-01-01', '2017-12-01'))
+refreshes = Stock.crumb_manager().counters['refreshes'] - counters['refreshes']
+report_result(not errors and refreshes == 1, 1, (errors, refreshes), ({}, 1))
+
+print('  Unavailable server is retried')
+counters = Stock.crumb_manager().counters
+server.failures = 2
+test_stock = run_async(Stock.aload('ROKU', '2017-01-01', '2017-12-01'))
+retries = Stock.crumb_manager().counters['retries'] - counters['retries']
+report_result(test_stock.close('2017-10-17') == 22.09 and retries == 2, 1,
+              (test_stock.close('2017-10-17'), retries), (22.09, 2))
+
+# Instrumentation
+print('\nRunning instrumentation tests against a stand-in server')
+timings = []
+record_timing = lambda phase, seconds, info: timings.append((phase, info))
+Stock.instruments.add_callback(record_timing)
+Stock.instruments.reset()
+Stock.instruments.enabled = True
+test_stock = Stock('ROKU', '2017-01-01', '2017-12-01')
+for case in BASIC_TESTS['ROKU'][:3]:
+    test_stock.day_info(case[0])
+Stock.instruments.enabled = False
+test_stock.day_info(BASIC_TESTS['ROKU'][0][0])
+snapshot = Stock.instruments.snapshot()
+
+print('  Every phase is counted')
+counts = {phase : stats['count'] for phase, stats in snapshot.items()}
+expected = {'fetch' : 2, 'parse' : 1, 'index' : 1, 'stats' : 1, 'lookup' : 3}
+report_result(counts == expected, 1, counts, expected)
+
+print('  Histograms and callbacks see every timing')
+buckets = {phase : sum(count for _, count in stats['histogram'])
+           for phase, stats in snapshot.items()}
+report_result(buckets == expected, 1, buckets, expected)
+callbacks = {phase : [timing[0] for timing in timings].count(phase) for phase in expected}
+report_result(callbacks == expected and all(info.get('ticker') == 'ROKU' for _, info in timings),
+              2, timings, expected)
+
+Stock.instruments.remove_callback(record_timing)
+Stock.instruments.reset()
+
+# History cache
+print('\nRunning history cache tests against a stand-in server')
+cache_path = tempfile.mkdtemp()
+Stock.history_cache = HistoryCache(cache_path)
+
+def cached_load(start, end):
+    """
+    Load ROKU through the history cache.
+
+    :returns: Days loaded and historical data requested for them, as recorded by the server.
+    """
+    del server.history_requests[:]
+    test_stock = Stock('ROKU', start, end)
+    return test_stock.stock, [request[2:] for request in server.history_requests]
+
+expected_days = Stock.from_csv('ROKU', OFFLINE_HISTORY['ROKU']).stock
+
+print('  First load downloads the range')
+days, requests = cached_load('2017-10-01', '2017-11-01')
+report_result(requests == [('2017-10-01', '2017-11-01')], 1, requests,
+              [('2017-10-01', '2017-11-01')])
+
+print('  Cached range is not requested again')
+days, requests = cached_load('2017-10-01', '2017-11-01')
+expected = [day for day in expected_days if '2017-10-01' <= str(day[0]) < '2017-11-02']
+report_result(requests == [] and days == expected, 1, (days, requests), (expected, []))
+
+print('  Only the missing head and tail are requested')
+days, requests = cached_load('2017-09-01', '2017-11-01')
+report_result(requests == [('2017-09-01', '2017-09-30')], 1, requests,
+              [('2017-09-01', '2017-09-30')])
+days, requests = cached_load('2017-09-01', '2017-12-01')
+report_result(requests == [('2017-11-02', '2017-12-01')] and days == expected_days, 2,
+              (days, requests), (expected_days, [('2017-11-02', '2017-12-01')]))
+
+print('  Corrupt and stale entries are downloaded again')
+_, meta_path = Stock.history_cache._entry_paths('ROKU', '1d')
+for case_num, meta in enumerate(('{"start" : 7', json.dumps(
+        {'start' : 736573, 'end' : 736664, 'created' : 0, 'updated' : 0})), 1):
+    with open(meta_path, 'w') as f:
+        f.write(meta)
+    days, requests = cached_load('2017-09-01', '2017-12-01')
+    _, requests_after = cached_load('2017-09-01', '2017-12-01')
+    report_result(requests == [('2017-09-01', '2017-12-01')] and requests_after == [] and
+                  days == expected_days, case_num, (days, requests, requests_after),
+                  (expected_days, [('2017-09-01', '2017-12-01')], []))
+
+Stock.history_cache = None
+shutil.rmtree(cache_path)
+
+# Storage
+print('\nRunning columnar storage tests')
+list_stock = Stock.from_csv('ROKU', OFFLINE_HISTORY['ROKU'])
+test_stock = Stock.from_csv('ROKU', OFFLINE_HISTORY['ROKU'], columnar=True)
+
+print('  ROKU')
+verify_basic_cases(test_stock, BASIC_TESTS['ROKU'])
+print('  Same days as list storage')
+report_result(test_stock.history.rows() == list_stock.stock, 1, test_stock.history.rows(),
+              list_stock.stock)
+
+# Compact storage
+print('\nRunning compact storage tests')
+compact_stock = Stock.from_csv('ROKU', OFFLINE_HISTORY['ROKU'], compact=True)
+
+print('  ROKU')
+verify_basic_cases(compact_stock, BASIC_TESTS['ROKU'])
+
+print('  Same days as list storage')
+history = compact_stock.history
+round_trips = [('Rows', CompactHistory.from_rows(list_stock.stock)), ('Views', history[1:4])]
+if arrow.pa is not None:
+    round_trips.append(('Arrow', arrow.from_table(arrow.to_table(history), compact=True)))
+report_result(history.rows() == list_stock.stock, 1, history.rows(), list_stock.stock)
+for case_num, (name, round_trip) in enumerate(round_trips, 2):
+    expected = list_stock.stock[1:4] if name == 'Views' else list_stock.stock
+    report_result(isinstance(round_trip, CompactHistory) and round_trip.rows() == expected,
+                  case_num, (name, round_trip.rows()), expected)
+
+print('  Prices are kept to the cent')
+prices = [0.29, 1.15, 4.35, 1234567.89, 21474836.47]
+history = CompactHistory(range(1, 6), prices, prices, prices, prices, prices, [1] * 5)
+report_result(list(history.close) == prices and [bar[1][0] for bar in history.rows()] == prices,
+              1, list(history.close), prices)
+try:
+    CompactHistory([1], [21474836.48], [0], [0], [0], [0], [0])
+    error = None
+except ValueError as e:
+    error = e
+report_result(error is not None, 2, error, 'ValueError')
+
+# Date lookups
+print('\nRunning date lookup tests')
+lookups = [
+    ('2017-01-01', '2017-09-28'),   # Before the first day
+    ('2017-09-28', '2017-09-28'),   # First day
+    ('2017-10-16', '2017-10-02'),   # Missing days resolve to the day before
+    ('2017-12-01', '2017-12-01'),   # Last day
+    ('2018-06-01', '2017-12-01'),   # After the last day
+]
+ranges = [
+    ('2017-09-01', '2017-09-29', ['2017-09-28']),                  # End is excluded
+    ('2017-10-03', '2017-10-17', ['2017-10-02']),                  # Between days
+    ('2017-11-30', '2018-01-01', ['2017-11-24', '2017-12-01']),    # Past the last day
+]
+for name, test_stock in (('List', list_stock), ('Columnar', test_stock)):
+    print('  %s' % name)
+    for case_num, (date, expected) in enumerate(lookups, 1):
+        day = test_stock.day_info(date)[0].strftime('%Y-%m-%d')
+        report_result(day == expected, case_num, day, expected)
+
+    for case_num, (start, end, expected) in enumerate(ranges, len(lookups) + 1):
+        days = test_stock.day_info(start, end)
+        days = [day[0].strftime('%Y-%m-%d') for day in (days if isinstance(days, list)
+                                                          else days.rows())]
+        report_result(days == expected, case_num, days, expected)
+
+# Many dates at once
+print('\nRunning batch date lookup tests')
+
+class DateArray:
+    """
+    Stand-in for array-likes such as pandas indexes - only converts to an array.
+    """
+
+    def __init__(self, dates):
+        self.dates = dates
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.dates, dtype='datetime64[D]')
+
+dates = [date for date, _ in lookups]
+expected = [day for _, day in lookups]
+batches = [
+    ('Sorted', dates, expected),
+    ('Reversed', tuple(reversed(dates)), list(reversed(expected))),
+    ('Ordinals', range(parse_date('2017-10-15').toordinal(), parse_date('2017-10-19').toordinal()),
+     ['2017-10-02', '2017-10-02', '2017-10-17', '2017-10-17']),
+    ('Arrays', np.array(dates, dtype='datetime64[D]'), expected),
+    ('Array-likes', DateArray(list(reversed(dates))), list(reversed(expected))),
+]
+for name, test_stock in (('List', list_stock), ('Columnar', test_stock)):
+    print('  %s' % name)
+    for case_num, (_, batch, expected) in enumerate(batches, 1):
+        days = test_stock.day_info(batch)
+        days = [day[0].strftime('%Y-%m-%d') for day in (days if isinstance(days, list)
+                                                          else days.rows())]
+        closes = list(test_stock.close(batch))
+        expected_closes = [test_stock.close(day) for day in expected]
+        report_result(days == expected and closes == expected_closes, case_num,
+                      (days, closes), (expected, expected_closes))
+
+print('  Strings are single dates')
+report_result(test_stock.close('2017-10-17') == 22.09, 1, test_stock.close('2017-10-17'), 22.09)
+
+# Ranges of columnar stocks are views
+print('\nRunning range view tests')
+history = test_stock.history
+for case_num, name in enumerate(('open', 'high', 'low', 'close', 'adj_close', 'volume'), 1):
+    values = getattr(test_stock, name)('2017-09-29', '2017-11-25')
+    expected = list(getattr(history, name)[1:5])
+    report_result(list(values) == expected and values.base is not None and
+                  np.shares_memory(values, getattr(history, name)), case_num, values,
+                  expected)
+
+# Universe files
+def mean_close(test_stock, days):
+    """
+    Sweep strategy - mean of the last closes.
+    """
+    return round(float(np.mean(test_stock.history.close[-days:])), 2)
+
+print('\nRunning universe tests')
+universe_path = tempfile.mkdtemp()
+stocks = [Stock.from_csv(ticker, OFFLINE_HISTORY[ticker], columnar=True)
+          for ticker in ('ROKU', 'MU')]
+Universe.write(os.path.join(universe_path, 'universe.bin'), stocks)
+universe = Universe(os.path.join(universe_path, 'universe.bin'))
+
+print('  Tickers in written order')
+report_result(universe.tickers == ['ROKU', 'MU'] and 'mu' in universe, 1, universe.tickers,
+              ['ROKU', 'MU'])
+
+print('  Same days as written')
+for case_num, original in enumerate(stocks, 1):
+    rows = universe[original.ticker].history.rows()
+    report_result(rows == original.history.rows(), case_num, rows, original.history.rows())
+
+print('  ROKU')
+test_stock = universe.stock('ROKU')
+verify_basic_cases(test_stock, BASIC_TESTS['ROKU'])
+
+print('  Stocks view the mapped file')
+report_result(not test_stock.history.close.flags.writeable, 1,
+              test_stock.history.close.flags.writeable, False)
+
+print('  Intraday stocks are refused')
+try:
+    Universe.write(os.path.join(universe_path, 'intraday.bin'),
+                   [Stock.from_csv('SPLT', INTRADAY_HISTORY, interval='5m')])
+    error = None
+except ValueError as e:
+    error = e
+report_result(error is not None and 'SPLT' in str(error), 1, error, 'ValueError')
+
+print('  Sweeps resume after a partial checkpoint line')
+checkpoint_path = os.path.join(universe_path, 'checkpoint.jsonl')
+with open(checkpoint_path, 'w') as f:
+    f.write(json.dumps({'ticker' : 'ROKU', 'params' : {'days' : 2}, 'result' : 33.0}) + '\n')
+    f.write('{"ticker" : "MU", "par') # Crashed while writing
+sweep = Sweep(os.path.join(universe_path, 'universe.bin'), mean_close, {'days' : [2, 3]},
+              checkpoint_path, processes=1)
+results = sorted((ticker, params['days'], result) for ticker, params, result in sweep.run())
+expected = [('MU', 2, 45.89), ('MU', 3, 45.86), ('ROKU', 2, 33.0), ('ROKU', 3, 35.04)]
+report_result(results == expected, 1, results, expected)
+with open(checkpoint_path) as f:
+    lines = [json.loads(line) for line in f]
+completed = sorted((ticker, params['days'], result)
+                   for ticker, params, result in sweep.completed())
+report_result(len(lines) == 4 and completed == expected, 2, lines, expected)
+
+del test_stock, universe
+shutil.rmtree(universe_path)
+
+# Panels of many stocks
+print('\nRunning panel tests')
+stocks = [Stock.from_csv(ticker, OFFLINE_HISTORY[ticker], columnar=True, advanced=True)
+          for ticker in ('ROKU', 'MU')]
+
+def same_values(values, expected):
+    """
+    Compare indicator values, NaN matching NaN.
+    """
+    return np.allclose(values, expected, equal_nan=True)
+
+print('  Same indicators as each stock')
+for case_num, test_stock in enumerate(stocks, 1):
+    panel = Panel([test_stock])
+    values = [list(panel.sma(2)[0]), list(panel.ema(3)[0])]
+    expected = [list(test_stock.indicators.sma(2)), list(test_stock.indicators.ema(3))]
+    report_result(same_values(values, expected), case_num, values, expected)
+
+print('  Missing bars')
+panel = Panel(stocks)
+roku, mu = panel.row('roku'), panel.row('MU')
+dates = [datetime.fromordinal(date).strftime('%Y-%m-%d') for date in panel.dates]
+sma = panel.sma(2)
+# Nothing before MU's first bar or on days a stock has no bar
+report_result(np.all(np.isnan(sma[mu, :dates.index('2017-11-14')])) and
+              np.all(np.isnan(sma[~panel.present])), 1, list(sma[mu]), 'NaN without bars')
+# ROKU's 10-17 close carries over the MU days before 11-24
+value = sma[roku, dates.index('2017-11-24')]
+report_result(np.isclose(value, (22.09 + 39.47) / 2), 2, value, (22.09 + 39.47) / 2)
+
+# Backtests
+print('\nRunning backtest tests')
+
+def loop_backtest(test_stock, signals, cash, commission, slippage):
+    """
+    Backtest day by day, the way backtest() is specified.
+
+    :returns: Lists of trades, cash and equity for each day
+    """
+    held = 0.0
+    trades, cash_held, equity = [], [], []
+    for i, (_, (open_price, _, _, close, _, _)) in enumerate(test_stock.history.rows()):
+        target = signals[i - 1] if i else 0.0
+        target = 0.0 if target != target else target # NaN means no position
+        trade = target - held
+        if trade:
+            fill = open_price * (1 + slippage if trade > 0 else 1 - slippage)
+            cash -= trade * fill + abs(trade * fill) * commission
+        held = target
+        trades.append(trade)
+        cash_held.append(cash)
+        equity.append(cash + held * close)
+    return trades, cash_held, equity
+
+signals = [10, 10, -5, float('nan'), 20, 20]
+test_stock = Stock.from_csv('ROKU', OFFLINE_HISTORY['ROKU'], columnar=True)
+
+print('  Same as trading day by day')
+for case_num, (commission, slippage) in enumerate(((0.0, 0.0), (0.001, 0.01)), 1):
+    result = backtest(test_stock, signals, 1000.0, commission, slippage)
+    expected = loop_backtest(test_stock, signals, 1000.0, commission, slippage)
+    values = [list(result.trades), list(result.cash), list(result.equity)]
+    report_result(np.allclose(values, expected), case_num, values, expected)
+
+print('  Portfolio equity carries over missing days')
+stocks = [test_stock, Stock.from_csv('MU', OFFLINE_HISTORY['MU'], columnar=True)]
+result = backtest_many(stocks, {'roku' : signals, 'MU' : [5, 0, 0]}, 1000.0)
+expected = []
+for date in result.dates:
+    total = 0.0
+    for test_stock in stocks:
+        equity = loop_backtest(test_stock, signals if test_stock.ticker == 'ROKU' else [5, 0, 0],
+                               1000.0, 0.0, 0.0)[2]
+        days = [i for i, key in enumerate(test_stock.stock_index) if key <= date]
+        total += equity[days[-1]] if days else 1000.0
+    expected.append(total)
+report_result(np.allclose(result.equity, expected), 1, list(result.equity), expected)
+
+# Tests reading local files
+data_path = tempfile.mkdtemp()
+write_history(data_path, OFFLINE_HISTORY)
+write_history(data_path, {'SPLT' : SPLIT_HISTORY, 'SPLT_div' : SPLIT_DIVIDENDS,
+                          'SPLT_split' : SPLIT_SPLITS, 'SPLT_5m' : INTRADAY_HISTORY})
+
+# Lazy stocks
+print('\nRunning lazy stock tests')
+Stock.source = SlowSource(data_path)
+
+print('  Lookups wait for loads in progress')
+test_stock = Stock('ROKU', '2017-01-01', '2017-12-01', lazy=True)
+test_stock.prefetch(stats=False)
+time.sleep(0.1)
+day_info = test_stock.day_info('2017-10-17')
+report_result(verify_day(day_info[1], BASIC_TESTS['ROKU'][4][1]), 1, day_info[1],
+              BASIC_TESTS['ROKU'][4][1])
+
+print('  Only what is used is loaded')
+test_stock = Stock('MU', '2017-01-01', '2017-12-01', lazy=True)
+verify_range_case(test_stock, RANGE_TESTS['MU'])
+report_result('stats' not in test_stock.__dict__, 2, list(test_stock.__dict__), 'no stats')
+
+print('  Indicators of advanced stocks load history')
+test_stock = Stock('ROKU', '2017-01-01', '2017-12-01', lazy=True, advanced=True)
+returns = list(test_stock.indicators.returns[1:3])
+expected = [26.54 / 23.50 - 1, 23.56 / 26.54 - 1]
+report_result(returns == expected, 1, returns, expected)
+test_stock = Stock('ROKU', '2017-01-01', '2017-12-01', lazy=True)
+report_result(not hasattr(test_stock, 'indicators'), 2, 'indicators', 'no indicators')
+
+# Dividends and splits
+print('\nRunning dividend and split tests')
+Stock.source = LocalSource(data_path)
+test_stock = Stock('SPLT', '2017-05-01', '2017-05-10', columnar=True, events=True)
+adjusted = test_stock.adjusted()
+history = test_stock.history
+
+print('  Prices are already split adjusted')
+prices = [list(getattr(adjusted, name)) for name in ('open', 'high', 'low', 'close', 'volume')]
+expected = [list(getattr(history, name)) for name in ('open', 'high', 'low', 'close', 'volume')]
+report_result(prices == expected, 1, prices, expected)
+
+print("  Adjusted closes match Yahoo's")
+adj_close = [round(value, 2) for value in adjusted.adj_close]
+report_result(adj_close == list(history.adj_close), 1, adj_close, list(history.adj_close))
+
+# Appending matches building from every day
+print('\nRunning append tests')
+lines = SPLIT_HISTORY.splitlines()
+
+def derived(test_stock):
+    """
+    Everything a stock derives from its days - index, indicators, resampled bars and the
+    dividend adjustment. Indicators are rounded, and NaN is None so it compares equal.
+    """
+    indicators = test_stock.indicators
+    values = [indicators.returns, indicators.log_returns, indicators.cumulative_returns,
+              indicators.true_range, indicators.sma(3), indicators.ema(3),
+              indicators.volatility(3)]
+    return [list(test_stock.stock_index), test_stock.history.rows(),
+            [[None if np.isnan(value) else round(value, 10) for value in column]
+             for column in values],
+            test_stock.resample('1wk').history.rows(), test_stock.adjusted().rows()]
+
+for compact in (False, True):
+    print('  %s' % ('Compact' if compact else 'Columnar'))
+    history_class = CompactHistory if compact else History
+    # Everything up to the last event, the days after it are adjusted on their own
+    test_stock = Stock.from_history('SPLT', history_class.from_csv('\n'.join(lines[:7])),
+                                    advanced=True)
+    derived(test_stock)
+    added = test_stock.append_bars('\n'.join(lines[:1] + lines[7:]))
+
+    full_stock = Stock.from_history('SPLT', history_class.from_csv(SPLIT_HISTORY), advanced=True)
+    values, expected = derived(test_stock), derived(full_stock)
+    report_result(added == 2 and values == expected, 1, (added, values), (2, expected))
+
+# Intraday bars
+print('\nRunning intraday tests')
+Stock.source = LocalSource(data_path, pattern='{ticker}_{interval}.csv')
+lines = INTRADAY_HISTORY.splitlines()
+
+print('  Updating')
+test_stock = Stock.from_csv('SPLT', '\n'.join(lines[:3]), interval='5m')
+added = test_stock.update('2017-05-05')
+# The last bar held is requested again and replaced
+report_result(added == 4 and len(test_stock.history) == 6, 1, (added, len(test_stock.history)),
+              (4, 6))
+
+print('  Dividends and splits')
+test_stock.request_events()
+adjusted = test_stock.adjusted()
+# Bars before the 05-04 ex-dividend date are adjusted by the close of the last one
+factor = 1 - 0.25 / 10.40
+expected = [round(close * factor, 2) for close in (10.22, 10.28, 10.40)] + [10.08, 10.02, 10.10]
+adj_close = [round(value, 2) for value in adjusted.adj_close]
+report_result(adj_close == expected, 1, adj_close, expected)
+
+print('  Resampling to days')
+test_stock = Stock.from_csv('SPLT', '\n'.join(lines[:3]), interval='5m')
+test_stock.resample('1d')
+test_stock.update('2017-05-05')
+daily = test_stock.resample('1d')
+expected = [[datetime(2017, 5, 3), (10.20, 10.45, 10.15, 10.40, 10.40, 95000)],
+            [datetime(2017, 5, 4), (10.15, 10.20, 10.00, 10.10, 10.10, 104000)]]
+days = daily.day_info('2017-05-03', '2017-05-05').rows()
+report_result(days == expected, 1, days, expected)
+report_result(daily.day_info('2017-05-04 12:00') == expected[1] and not daily.intraday, 2,
+              daily.day_info('2017-05-04 12:00'), expected[1])
+
+print('  Resampled stocks update from base bars')
+test_stock = Stock.from_csv('SPLT', '\n'.join(lines[:3]), interval='5m')
+daily = test_stock.resample('1d')
+added = daily.update('2017-05-05')
+days = daily.day_info('2017-05-03', '2017-05-05').rows()
+report_result(added == 1 and days == expected and daily.interval == '1d', 1, (added, days),
+              (1, expected))
+Stock.source = LocalSource(data_path)
+weekly = Stock.from_csv('SPLT', SPLIT_HISTORY.split('2017-05-09')[0]).resample('1wk')
+added = weekly.update('2017-05-10')
+bars = weekly.history.rows()
+expected = Stock.from_csv('SPLT', SPLIT_HISTORY).resample('1wk').history.rows()
+report_result(added == 0 and bars == expected, 2, (added, bars), (0, expected))
+
+if arrow.pa is not None:
+    print('  Parquet datasets keep the interval')
+    dataset_path = os.path.join(data_path, 'dataset')
+    intraday_stock = Stock.from_csv('SPLT', INTRADAY_HISTORY, interval='5m')
+    daily_stock = Stock.from_csv('MU', OFFLINE_HISTORY['MU'])
+    arrow.write_dataset(dataset_path, [intraday_stock])
+    arrow.write_dataset(dataset_path, [daily_stock])
+    stocks = Stock.from_parquet(dataset_path)
+    intervals = {ticker : (test_stock.interval, test_stock.intraday)
+                 for ticker, test_stock in stocks.items()}
+    expected = {'MU' : ('1d', False), 'SPLT' : ('5m', True)}
+    report_result(intervals == expected and
+                  stocks['SPLT'].history.rows() == intraday_stock.history.rows(), 1,
+                  intervals, expected)
+
+    print('  Daily and intraday stocks are not mixed')
+    try:
+        arrow.write_dataset(dataset_path, [daily_stock, intraday_stock])
+        error = None
+    except ValueError as e:
+        error = e
+    report_result(error is not None and 'SPLT' in str(error), 1, error, 'ValueError')
 
-            exp_idx += 1
+    print('  Intraday bars written without an interval need one')
+    table = arrow.to_table(intraday_stock.history)
+    arrow.ds.write_dataset(table.append_column('ticker', arrow.pa.repeat('SPLT', len(table))),
+                           dataset_path, format='parquet', partitioning=arrow.PARTITIONING,
+                           existing_data_behavior='delete_matching')
+    try:
+        Stock.from_parquet(dataset_path, ['SPLT'])
+        error = None
+    except ValueError as e:
+        error = e
+    test_stock = Stock.from_parquet(dataset_path, ['SPLT'], interval='5m')['SPLT']
+    report_result(error is not None and test_stock.interval == '5m', 1, error, 'ValueError')
 
-    if exp_idx != num_cases:
-        # In some cases this is good because we want to test boundaries which don't include extra days
-        print('***WARNING*** Not all test cases were encountered. %s were skipped. Verify this is expected.' % (num_cases - exp_idx))
+shutil.rmtree(data_path)
 
 
-# More testing added below as new features added -- or make a new file?
\ No newline at end of file
+if FAILED_CASES:
+    sys.exit(1)
@@ -49,4 +49,71 @@ RANGE_TESTS = {
             ('2017-11-30',[44.16,44.54,41.86,42.39,42.39,63895700]),
         ]
     },
-}
\ No newline at end of file
+}
+#
+# Offline test data, served by a stand-in for Yahoo finance or read from local files
+#
+#  Historical data holds the days of the test cases above, as Yahoo finance CSV.
+#
+OFFLINE_HISTORY = {
+    "ROKU" : """Date,Open,High,Low,Close,Adj Close,Volume
+2017-09-28,15.800000,23.500000,15.750000,23.500000,23.500000,39265900
+2017-09-29,26.740000,29.799999,25.469999,26.540001,26.540001,44294700
+2017-10-02,25.200001,26.280001,23.260000,23.559999,23.559999,16008400
+2017-10-17,22.290001,22.500000,21.500000,22.090000,22.090000,1830800
+2017-11-24,41.189999,41.259998,39.160000,39.470001,39.470001,4689900
+2017-12-01,43.740002,44.750000,42.310001,43.549999,43.549999,4777300
+""",
+    "MU" : """Date,Open,High,Low,Close,Adj Close,Volume
+2017-11-14,45.580002,46.000000,44.799999,45.799999,45.799999,29899200
+2017-11-21,48.360001,49.630001,48.150002,49.400002,49.400002,35756600
+2017-11-30,44.160000,44.540001,41.860001,42.389999,42.389999,63895700
+""",
+}
+
+OFFLINE_STATISTICS = """<html><body><div class="Mstart(a) Mend(a)"><table>
+<tr><td><span>Market Cap (intraday)</span></td><td class="Fz(s) Fw(500) Ta(end)">4.42B</td></tr>
+<tr><td><span>Beta</span></td><td class="Fz(s) Fw(500) Ta(end)">N/A</td></tr>
+</table></div></body></html>
+"""
+
+# Statistics parsed from OFFLINE_STATISTICS
+OFFLINE_STATISTICS_TESTS = {
+    'Market Cap (intraday)' : 4.42e9,
+    'Beta' : None,
+}
+#
+# Dividend and split test data
+#
+#  Yahoo finance prices are already split adjusted, adj_close is also adjusted for
+#  dividends: 1 - 0.25 / 10.40 for days before the 05-04 ex-dividend date. The 2:1 split on
+#  05-08 must not change any price.
+#
+SPLIT_HISTORY = """Date,Open,High,Low,Close,Adj Close,Volume
+2017-05-01,9.90,10.05,9.85,10.00,9.759615,2000000
+2017-05-02,10.00,10.25,9.95,10.20,9.954808,2200000
+2017-05-03,10.20,10.45,10.15,10.40,10.150000,1800000
+2017-05-04,10.15,10.20,10.00,10.10,10.100000,2400000
+2017-05-05,10.10,10.35,10.05,10.30,10.300000,2000000
+2017-05-08,10.30,10.55,10.25,10.50,10.500000,2600000
+2017-05-09,10.50,10.65,10.45,10.60,10.600000,1900000
+2017-05-10,10.60,10.65,10.35,10.40,10.400000,2100000
+"""
+SPLIT_DIVIDENDS = """Date,Dividends
+2017-05-04,0.250000
+"""
+SPLIT_SPLITS = """Date,Stock Splits
+2017-05-08,2/1
+"""
+
+#
+# Intraday test data - 5 minute bars, dated in UTC
+#
+INTRADAY_HISTORY = """Date,Open,High,Low,Close,Adj Close,Volume
+2017-05-03 13:30:00,10.20,10.25,10.15,10.22,10.22,30000
+2017-05-03 13:35:00,10.22,10.30,10.20,10.28,10.28,25000
+2017-05-03 19:55:00,10.35,10.45,10.30,10.40,10.40,40000
+2017-05-04 13:30:00,10.15,10.20,10.05,10.08,10.08,35000
+2017-05-04 13:35:00,10.08,10.12,10.00,10.02,10.02,28000
+2017-05-04 19:55:00,10.05,10.12,10.04,10.10,10.10,41000
+"""